@@ -0,0 +1,205 @@
+from benchmarks.sitegen import generate_site
+from mkdocs2.server import LazySite
+import click
+import json
+import mkdocs2
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def run_benchmarks(
+    config: typing.Dict, repeat: int = 3, jobs: int = 1, warm_cache: bool = False
+) -> typing.Dict[str, float]:
+    """
+    Time the builds of the site with the given config, returning a dict of
+    results. Timings are the best of `repeat` runs, in seconds.
+
+    If `warm_cache` is set, then the cache directory is kept between builds,
+    rather than being cleared before each full build.
+
+    * `full_build` - A clean build of the output directory.
+    * `incremental_noop` - An incremental build, with nothing changed.
+    * `incremental_one_page` - An incremental build, with a single page changed.
+    * `serve_cold_start` - Loading the site, and serving the homepage, as `serve` does.
+    * `memory_peak` - The peak memory allocated during a clean build, in megabytes.
+    """
+    output_dir = config["build"]["output_dir"]
+    cache_dir = config["build"]["cache_dir"]
+    input_dir = config["build"]["input_dir"]
+    page_path = next(
+        os.path.join(dirpath, filename)
+        for dirpath, dirnames, filenames in sorted(os.walk(input_dir))
+        for filename in sorted(filenames)
+        if filename.endswith(".md")
+    )
+
+    def full_build() -> None:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        if not warm_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        mkdocs2.build(config, jobs=jobs)
+
+    def incremental_noop() -> None:
+        mkdocs2.build(config, incremental=True, jobs=jobs)
+
+    def incremental_one_page() -> None:
+        with open(page_path, "a") as page_file:
+            page_file.write("\nAn extra paragraph.\n")
+        mkdocs2.build(config, incremental=True, jobs=jobs)
+
+    def serve_cold_start() -> None:
+        site = LazySite(config)
+        assert site.get("/") is not None
+
+    if warm_cache:
+        mkdocs2.build(config, jobs=jobs)
+    results = {"full_build": best_of(full_build, repeat)}
+    mkdocs2.build(config, incremental=True, jobs=jobs)
+    results["incremental_noop"] = best_of(incremental_noop, repeat)
+    results["incremental_one_page"] = best_of(incremental_one_page, repeat)
+    results["serve_cold_start"] = best_of(serve_cold_start, repeat)
+
+    tracemalloc.start()
+    try:
+        full_build()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    results["memory_peak"] = peak / (1024 * 1024)
+    return results
+
+
+def best_of(func: typing.Callable[[], None], repeat: int) -> float:
+    """
+    Return the shortest time taken to run `func`, over `repeat` runs.
+
+    Any generated API modules are unloaded before each run, so that the time
+    taken to import them for autodoc is included, as it would be with the CLI.
+    """
+    timings = []
+    for _ in range(repeat):
+        for name in list(sys.modules):
+            if name.split(".", 1)[0] == "benchmark_api":
+                del sys.modules[name]
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def compare_to_baseline(
+    results: typing.Dict[str, float],
+    baseline: typing.Dict[str, float],
+    tolerance: float,
+) -> typing.List[str]:
+    """
+    Return a list of the results that are worse than the baseline by more
+    than `tolerance`. Eg. `tolerance=0.2` allows results to be 20% worse.
+    """
+    regressions = []
+    for name, value in results.items():
+        if name in baseline and value > baseline[name] * (1 + tolerance):
+            regressions.append(name)
+    return regressions
+
+
+@click.command()
+@click.option("--pages", type=int, default=200)
+@click.option("--nav-depth", type=int, default=3)
+@click.option("--code-blocks", type=int, default=3)
+@click.option("--autodoc", type=int, default=1)
+@click.option("--links", type=int, default=10)
+@click.option("--assets", type=int, default=20)
+@click.option("--asset-size", type=int, default=256 * 1024)
+@click.option("--repeat", type=int, default=3)
+@click.option("--jobs", "-j", type=int, default=1)
+@click.option("--warm-cache", is_flag=True, default=False)
+@click.option("--baseline", "baseline_path", default=BASELINE_PATH)
+@click.option("--save-baseline", is_flag=True, default=False)
+@click.option("--tolerance", type=float, default=0.2)
+def main(
+    pages: int,
+    nav_depth: int,
+    code_blocks: int,
+    autodoc: int,
+    links: int,
+    assets: int,
+    asset_size: int,
+    repeat: int,
+    jobs: int,
+    warm_cache: bool,
+    baseline_path: str,
+    save_baseline: bool,
+    tolerance: float,
+) -> None:
+    """
+    Benchmark building a synthetic site, and compare against a stored baseline.
+    """
+    site = {
+        "pages": pages,
+        "nav_depth": nav_depth,
+        "code_blocks": code_blocks,
+        "autodoc": autodoc,
+        "links": links,
+        "assets": assets,
+        "asset_size": asset_size,
+    }
+    # How the builds are run, which also affects the results.
+    settings = {"jobs": jobs, "warm_cache": warm_cache}
+    with tempfile.TemporaryDirectory() as root:
+        config = generate_site(root, **site)
+        sys.path.insert(0, root)
+        try:
+            results = run_benchmarks(
+                config, repeat=repeat, jobs=jobs, warm_cache=warm_cache
+            )
+        finally:
+            sys.path.remove(root)
+
+    baseline = {}  # type: typing.Dict[str, typing.Any]
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+    # Only compare against a baseline of the same site and settings.
+    compare = (
+        baseline.get("site") == site
+        and baseline.get("settings") == settings
+        and not save_baseline
+    )
+    regressions = []  # type: typing.List[str]
+    if compare:
+        regressions = compare_to_baseline(results, baseline["results"], tolerance)
+
+    for name, value in results.items():
+        unit = "MB" if name == "memory_peak" else "s"
+        line = f"{name:<24} {value:>10.3f} {unit}"
+        if compare and name in baseline["results"]:
+            line += f"  (baseline {baseline['results'][name]:.3f} {unit})"
+        if name in regressions:
+            line += "  REGRESSION"
+        click.echo(line)
+
+    if save_baseline:
+        with open(baseline_path, "w") as baseline_file:
+            json.dump(
+                {"site": site, "settings": settings, "results": results},
+                baseline_file,
+                indent=4,
+            )
+        click.echo(f"Saved baseline to {baseline_path!r}.")
+    elif not compare:
+        click.echo("No baseline for these settings. Use --save-baseline to store one.")
+    elif regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":  # pragma: nocover
+    main()
@@ -0,0 +1,202 @@
+import os
+import posixpath
+import random
+import typing
+import yaml
+
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <link href="{{ url('/css/highlight.css') }}" rel="stylesheet">
+  </head>
+  <body>
+    <ul>
+    {% for nav_item in nav recursive %}
+      <li class="{% if nav_item.is_active %}active{% endif %}">
+      {% if nav_item.is_page %}
+        <a href="{{ nav_item.url }}">{{ nav_item.title }}</a>
+      {% else %}
+        {{ nav_item.title }}
+        <ul>{{ loop(nav_item.children) }}</ul>
+      {% endif %}
+      </li>
+    {% endfor %}
+    </ul>
+    <ul>
+    {% for header in toc.headers recursive %}
+      <li><a href="#{{ header.id }}">{{ header.name }}</a>
+      {% if header.children %}<ul>{{ loop(header.children) }}</ul>{% endif %}
+      </li>
+    {% endfor %}
+    </ul>
+    {{ content }}
+  </body>
+</html>
+"""
+
+CODE_BLOCK = """```python
+def function_{index}(alpha, beta=None, *args, **kwargs):
+    \"\"\"
+    Return a value computed from the arguments.
+    \"\"\"
+    results = []
+    for idx in range({index}):
+        if beta is not None and idx % 2:
+            results.append(alpha * idx + beta)
+        else:
+            results.append({{"index": idx, "value": str(alpha)}})
+    return sorted(results, key=lambda item: repr(item))
+```
+"""
+
+MODULE = '''
+class Class{index}:
+    """
+    An example class, number {index}.
+
+    Used to exercise the `:::` autodoc directive.
+    """
+
+    def __init__(self, alpha: int, beta: str = "beta") -> None:
+        self.alpha = alpha
+        self.beta = beta
+{methods}
+'''
+
+METHOD = '''
+    def method_{index}(self, value: int, *args: int, flag: bool = False) -> int:
+        """
+        Return `value` combined with the instance attributes.
+
+        **Parameters:**
+
+        * `value` - The value to combine.
+        * `flag` - Whether to combine using multiplication.
+        """
+        return value * self.alpha if flag else value + self.alpha
+'''
+
+
+def generate_site(
+    root: str,
+    pages: int = 200,
+    nav_depth: int = 3,
+    fanout: int = 5,
+    code_blocks: int = 3,
+    autodoc: int = 1,
+    links: int = 10,
+    assets: int = 20,
+    asset_size: int = 256 * 1024,
+    seed: int = 0,
+) -> typing.Dict:
+    """
+    Write a synthetic documentation site into `root`, returning its config.
+
+    **Parameters:**
+
+    * `pages` - The number of Markdown pages, in addition to the homepage.
+    * `nav_depth` - The depth of the nested sections that the pages are placed in.
+    * `fanout` - The number of sub-sections, or pages, within each section.
+    * `code_blocks` - The number of fenced code blocks on each page.
+    * `autodoc` - The number of `:::` autodoc directives on each page.
+    * `links` - The number of links to other pages, on each page.
+    * `assets` - The number of static files.
+    * `asset_size` - The size of each static file, in bytes.
+    * `seed` - The seed used to choose the link targets.
+
+    Autodoc directives reference modules in a `benchmark_api` package, which
+    is written into `root`, so `root` must be on `sys.path` when building.
+    """
+    rng = random.Random(seed)
+    input_dir = os.path.join(root, "docs")
+    output_dir = os.path.join(root, "site")
+    template_dir = os.path.join(root, "templates")
+    cache_dir = os.path.join(root, "cache")
+    api_dir = os.path.join(root, "benchmark_api")
+
+    write_file(os.path.join(template_dir, "base.html"), TEMPLATE)
+
+    # Autodoc modules, one per directive within a page.
+    write_file(os.path.join(api_dir, "__init__.py"), "")
+    for index in range(autodoc):
+        methods = "".join(METHOD.format(index=idx) for idx in range(10))
+        text = MODULE.format(index=index, methods=methods)
+        write_file(os.path.join(api_dir, f"module_{index}.py"), text)
+
+    # Markdown pages, and the nav.
+    paths = [get_page_path(index, nav_depth, fanout) for index in range(pages)]
+    nav = {"Home": "index.md"}  # type: typing.Dict[str, typing.Any]
+    home = ["# Home", ""] + [
+        f"* [Page {idx}]({path})" for idx, path in enumerate(paths)
+    ]
+    write_file(os.path.join(input_dir, "index.md"), "\n".join(home) + "\n")
+    for index, path in enumerate(paths):
+        section = nav
+        for part in path.split("/")[:-1]:
+            section = section.setdefault(part.replace("-", " ").title(), {})
+        section[f"Page {index}"] = path
+
+        lines = [f"# Page {index}", ""]
+        for block in range(code_blocks):
+            lines += [f"## Example {block}", "", CODE_BLOCK.format(index=block)]
+        for block in range(autodoc):
+            lines += [f"::: benchmark_api.module_{block}.Class{block}", ""]
+        lines += ["## Links", ""]
+        for target in rng.sample(paths, min(links, len(paths))):
+            href = posixpath.relpath(target, posixpath.dirname(path) or ".")
+            lines.append(f"* [Link to {target}]({href})")
+        write_file(os.path.join(input_dir, path), "\n".join(lines) + "\n")
+
+    # Static assets.
+    for index in range(assets):
+        asset_path = os.path.join(input_dir, "assets", f"asset-{index}.bin")
+        os.makedirs(os.path.dirname(asset_path), exist_ok=True)
+        with open(asset_path, "wb") as asset_file:
+            asset_file.write(os.urandom(asset_size))
+
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+            "cache_dir": cache_dir,
+        },
+        "nav": nav,
+        "convertors": [
+            "mkdocs2.convertors.MarkdownPages",
+            "mkdocs2.convertors.StaticFiles",
+            "mkdocs2.convertors.CodeHighlight",
+        ],
+    }
+    write_file(
+        os.path.join(root, "mkdocs.yml"), yaml.safe_dump(config, sort_keys=False)
+    )
+    return config
+
+
+def get_page_path(index: int, nav_depth: int, fanout: int) -> str:
+    """
+    Return the input path of a page, nesting pages into `nav_depth` levels of
+    sections with `fanout` items in each.
+
+    Eg. `get_page_path(7, nav_depth=3, fanout=5) == "section-0/section-1/page-7.md"`
+    """
+    parts = []  # type: typing.List[str]
+    remaining = index // fanout
+    for _ in range(nav_depth - 1):
+        parts.insert(0, f"section-{remaining % fanout}")
+        remaining //= fanout
+    parts.append(f"page-{index}.md")
+    return "/".join(parts)
+
+
+def write_file(path: str, text: str) -> None:
+    """
+    Helper function to write 'text' to the file at 'path'.
+    """
+    dirname = os.path.dirname(path)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(path, "w") as output:
+        output.write(text)
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import typing
+
+
+class DiskCache:
+    """
+    A persistent cache, that stores each value as a JSON file under
+    `cache_dir/namespace`, named by a digest of its key.
+
+    Values are written to a temporary file and then moved into place, so the
+    cache may safely be shared between parallel build processes.
+    """
+
+    def __init__(self, cache_dir: str, namespace: str) -> None:
+        self.directory = os.path.join(cache_dir, namespace)
+
+    def get_path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".json")
+
+    def get(self, key: str) -> typing.Any:
+        """
+        Return the value stored for `key`, or `None` if there isn't one.
+        """
+        try:
+            with open(self.get_path(key), "r") as cache_file:
+                entry = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        # Guard against the unlikely case of a digest collision.
+        if entry.get("key") != key:
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value: typing.Any) -> None:
+        path = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump({"key": key, "value": value}, cache_file)
+            os.replace(temp_path, path)
+        except BaseException:  # pragma: nocover
+            os.remove(temp_path)
+            raise
+
+
+class PicklableLock:
+    """
+    Mixin that drops `self.lock` when pickled, and creates a new one when unpickled.
+    """
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: typing.Dict[str, typing.Any]) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
@@ -1,39 +1,118 @@
+from mkdocs2.profiling import Profiler
+from mkdocs2.server import BuildVersion, DocsServer, LazySite, RequestHandler, Watcher
 import click
-import http.server
+import functools
 import mkdocs2
 import os
-import socketserver
-import tempfile
+import threading
+import time
 import typing
 import yaml
 
 
 @click.command()
 @click.option("--config", "config_file", type=click.File(), default="mkdocs.yml")
-def build(config_file: typing.TextIO) -> None:
+@click.option("--incremental", is_flag=True, default=False)
+@click.option("--jobs", "-j", type=int, default=1)
+@click.option("--profile", is_flag=True, default=False)
+@click.option("--profile-trace", type=click.Path(dir_okay=False), default=None)
+def build(
+    config_file: typing.TextIO,
+    incremental: bool,
+    jobs: int,
+    profile: bool,
+    profile_trace: typing.Optional[str],
+) -> None:
     content = config_file.read()
-    config = yaml.load(content)
-    mkdocs2.build(config)
+    config = yaml.safe_load(content)
+    profiler = Profiler(enabled=profile or profile_trace is not None)
+    with profiler.measure("build", "build"):
+        mkdocs2.build(config, incremental=incremental, jobs=jobs, profiler=profiler)
+    if profile:
+        click.echo(profiler.get_summary())
+    if profile_trace is not None:
+        profiler.write_trace(profile_trace)
+
+
+@click.command("compile-templates")
+@click.option("--config", "config_file", type=click.File(), default="mkdocs.yml")
+@click.argument("target_dir", type=click.Path(file_okay=False))
+def compile_templates(config_file: typing.TextIO, target_dir: str) -> None:
+    """
+    Precompile the templates, for use with the `compiled_templates` setting.
+    """
+    config = yaml.safe_load(config_file.read())
+    mkdocs2.core.compile_templates(config, target_dir)
+    click.echo(f"Compiled templates into {target_dir!r}.")
 
 
 @click.command()
 @click.option("--config", "config_file", type=click.File(), default="mkdocs.yml")
-def serve(config_file: typing.TextIO) -> None:  # pragma: nocover
-    content = config_file.read()
-    config = yaml.load(content)
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        config["build"]["url"] = "http://127.0.0.1:8000/"
-        config["build"]["output_dir"] = tmpdir
-        mkdocs2.build(config)
-        os.chdir(tmpdir)
-        addr = ("", 8000)
-        handler = http.server.SimpleHTTPRequestHandler
-        socketserver.TCPServer.allow_reuse_address = True
-        with socketserver.TCPServer(addr, handler) as httpd:
-            msg = 'Documentation available at "http://127.0.0.1:8000/" (Ctrl+C to quit)'
-            click.echo(msg)
-            httpd.serve_forever()
+@click.option("--watch/--no-watch", default=True)
+def serve(config_file: typing.TextIO, watch: bool) -> None:  # pragma: nocover
+    config_path = os.path.abspath(config_file.name)
+    config = load_serve_config(config_path)
+    site = LazySite(config)
+
+    build_version = None
+    if watch:
+        build_version = BuildVersion()
+        thread = threading.Thread(
+            target=watch_and_reload,
+            args=(config_path, site, build_version),
+            daemon=True,
+        )
+        thread.start()
+
+    addr = ("", 8000)
+    handler = functools.partial(RequestHandler, site=site, build_version=build_version)
+    with DocsServer(addr, handler) as httpd:
+        msg = 'Documentation available at "http://127.0.0.1:8000/" (Ctrl+C to quit)'
+        click.echo(msg)
+        httpd.serve_forever()
+
+
+def load_serve_config(config_path: str) -> typing.Dict:  # pragma: nocover
+    with open(config_path, "r") as config_file:
+        config = yaml.safe_load(config_file.read())
+    config["build"]["url"] = "http://127.0.0.1:8000/"
+    return config
+
+
+def get_watch_paths(
+    config_path: str, config: typing.Dict
+) -> typing.List[str]:  # pragma: nocover
+    return [config_path, config["build"]["input_dir"], config["build"]["template_dir"]]
+
+
+def watch_and_reload(
+    config_path: str, site: LazySite, build_version: BuildVersion
+) -> None:  # pragma: nocover
+    """
+    Watch the input, templates, and config file, reloading the site if
+    required, and notifying any browsers whenever they change.
+    """
+    watcher = Watcher(get_watch_paths(config_path, site.config))
+    while True:
+        time.sleep(0.1)
+        changes = watcher.get_changes()
+        if not changes:
+            continue
+
+        start = time.monotonic()
+        try:
+            if config_path in changes:
+                site.config = load_serve_config(config_path)
+                watcher = Watcher(get_watch_paths(config_path, site.config))
+                site.load()
+            elif site.requires_reload(changes):
+                site.load()
+        except Exception as exc:
+            click.echo(f"Reload failed: {exc!r}", err=True)
+            continue
+        build_version.increment()
+        elapsed = time.monotonic() - start
+        click.echo(f"Reloaded documentation in {elapsed:.2f}s")
 
 
 @click.group()
@@ -42,4 +121,5 @@ def cli() -> None:
 
 
 cli.add_command(build)
+cli.add_command(compile_templates)
 cli.add_command(serve)
@@ -1,6 +1,8 @@
+from mkdocs2.convertors.assets import Assets
 from mkdocs2.convertors.markdown_pages import MarkdownPages
 from mkdocs2.convertors.static_files import StaticFiles
 from mkdocs2.convertors.code_highlight import CodeHighlight
+from mkdocs2.convertors.search import Search
 
 
-__all__ = ["CodeHighlight", "MarkdownPages", "StaticFiles"]
+__all__ = ["Assets", "CodeHighlight", "MarkdownPages", "Search", "StaticFiles"]
@@ -0,0 +1,48 @@
+import os
+import typing
+from mkdocs2.convertors.static_files import StaticFiles
+from mkdocs2.file_copy import hash_file
+from mkdocs2.types import File
+
+
+def fingerprint_file(file: File, digest: str) -> None:
+    """
+    Output `file` to a path that includes `digest`, such as "css/base.3f9a1c2e.css",
+    keeping its original URL as an alias, so that links to it still resolve.
+    """
+    root, ext = os.path.splitext(file.output_path)
+    file.aliases = [file.url]
+    file.output_path = f"{root}.{digest}{ext}"
+
+
+class Assets(StaticFiles):
+    """
+    Copies assets such as stylesheets and scripts across to the output
+    directory, with a hash of their contents in the filename. Eg. "css/base.css"
+    is output as "css/base.3f9a1c2e.css".
+
+    Any links to the original path, whether from templates or Markdown, are
+    rewritten to the fingerprinted path. Assets may then be served with
+    long-lived cache headers, since a changed asset always has a new URL.
+
+    Must be listed before `StaticFiles`, which otherwise handles every file.
+
+    * `patterns` - Glob patterns for the files to fingerprint.
+    * `hash_length` - The number of hex characters of the hash to include.
+    * `compare`, `method` - As for `StaticFiles`.
+    """
+
+    def __init__(
+        self,
+        patterns: typing.List[str] = None,
+        hash_length: int = 8,
+        compare: str = "mtime",
+        method: str = "copy",
+    ) -> None:
+        super().__init__(compare=compare, method=method)
+        self.patterns = ["*.css", "*.js"] if patterns is None else patterns
+        self.hash_length = hash_length
+
+    def prepare_file(self, file: File) -> None:
+        digest = hash_file(file.full_input_path)
+        fingerprint_file(file, digest[: self.hash_length])
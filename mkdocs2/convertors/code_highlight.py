@@ -1,24 +1,48 @@
+import hashlib
 import typing
+from mkdocs2.convertors.assets import fingerprint_file
 from mkdocs2.types import Convertor, File, Env, TableOfContents
 from pygments.formatters import HtmlFormatter
 
 
 class CodeHighlight(Convertor):
+    """
+    Outputs the stylesheet for highlighted code.
+
+    * `style` - The Pygments style to use.
+    * `path` - The output path of the stylesheet.
+    * `fingerprint` - Include a hash of the stylesheet in its filename, as
+    with the `Assets` convertor. Links to `path` are rewritten to it.
+    * `hash_length` - The number of hex characters of the hash to include.
+    """
+
+    patterns = []  # type: typing.List[str]
+
     def __init__(
-        self, style: str = "friendly", path: str = "css/highlight.css"
+        self,
+        style: str = "friendly",
+        path: str = "css/highlight.css",
+        fingerprint: bool = False,
+        hash_length: int = 8,
     ) -> None:
         self.style = style
         self.path = path
-
-    def should_handle_file(self, input_path: str) -> bool:
-        return False
+        self.fingerprint = fingerprint
+        self.hash_length = hash_length
 
     def get_extra_paths(self) -> typing.List[str]:
         return [self.path]
 
+    def get_css(self) -> str:
+        return HtmlFormatter(style=self.style).get_style_defs()
+
+    def prepare_file(self, file: File) -> None:
+        if self.fingerprint:
+            digest = hashlib.sha1(self.get_css().encode("utf-8")).hexdigest()
+            fingerprint_file(file, digest[: self.hash_length])
+
     def build_toc(self, file: File, env: Env) -> typing.Optional[TableOfContents]:
         return None
 
     def convert(self, file: File, env: Env) -> None:
-        css = HtmlFormatter(style=self.style).get_style_defs()
-        file.write_output_text(css)
+        file.write_output_text(self.get_css())
@@ -1,22 +1,62 @@
+from mkdocs2.cache import DiskCache, PicklableLock
+from mkdocs2.manifest import get_stat_info, is_unchanged
 from mkdocs2.types import Convertor, File, Files, TableOfContents, Header, Env
-import fnmatch
 import functools
+import hashlib
 import os
 import jinja2
+import markdown
+import pygments
+import threading
 import typing
 from markdown import Markdown
-from markdown.extensions.codehilite import CodeHiliteExtension
 from markdown.extensions.toc import TocExtension
-from markdown.extensions.fenced_code import FencedCodeExtension
-from mkdocs2.markdown_extensions.autodoc import AutoDocExtension
+from mkdocs2.markdown_extensions.autodoc import AutoDocCache, AutoDocExtension
 from mkdocs2.markdown_extensions.convert_urls import ConvertURLs
+from mkdocs2.markdown_extensions.highlight import Highlight, Highlighter
+from mkdocs2.markdown_extensions.search_index import SearchIndex
 
 
-class MarkdownPages(Convertor):
+# Bump this whenever the format of the cached fragments changes.
+FRAGMENT_CACHE_VERSION = 1
+
+
+class MarkdownPages(PicklableLock, Convertor):
+    """
+    Renders Markdown pages into HTML, using the "base.html" template.
+
+    * `autodoc` - How `:::` directives find the documentation for each item.
+    Either "import" to import the item, or "static" to parse the source file
+    without importing it, so that no import time code is run.
+    * `guess_lang` - Whether to guess the language of code blocks that don't
+    specify one, or specify an unknown one.
+    * `default_lang` - The language of code blocks that don't specify one.
+    """
+
     patterns = ["**.md"]
 
-    def should_handle_file(self, input_path: str) -> bool:
-        return any([fnmatch.fnmatch(input_path, pattern) for pattern in self.patterns])
+    def __init__(
+        self, autodoc: str = "import", guess_lang: bool = True, default_lang: str = None
+    ) -> None:
+        assert autodoc in ("import", "static")
+        self.autodoc = autodoc
+        self.guess_lang = guess_lang
+        self.default_lang = default_lang
+        # Creating a `Markdown` instance registers every extension's processors
+        # and patterns, so we keep a pool of instances, and reset them between
+        # documents rather than building a new instance for each page.
+        self._markdown_pool = []  # type: typing.List[Markdown]
+        # Whether the pooled instances include the `SearchIndex` extension.
+        self._search_index = False
+        # The autodoc cache and highlighter shared by every pooled instance.
+        self._caches = None  # type: typing.Optional[tuple]
+        self.lock = threading.Lock()
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        # Worker processes build their own pool of `Markdown` instances.
+        state = super().__getstate__()
+        state["_markdown_pool"] = []
+        return state
 
     def get_output_path(self, input_path: str) -> str:
         output_path = os.path.splitext(input_path)[0]
@@ -28,6 +68,8 @@ class MarkdownPages(Convertor):
         return []
 
     def build_toc(self, file: File, env: Env) -> typing.Optional[TableOfContents]:
+        # The markdown is parsed just once, here. The converted content is
+        # stored on the file, ready for `convert()` to render into the page.
         # See https://python-markdown.github.io/extensions/toc/
 
         def get_headers(toc_tokens: typing.List[dict]) -> typing.List[Header]:
@@ -41,34 +83,159 @@ class MarkdownPages(Convertor):
                 for token in toc_tokens
             ]
 
-        md = Markdown(extensions=[TocExtension()])
+        # If there's a cache directory, then reuse the converted content from
+        # a previous build, when the page is unchanged. Eg. when only the
+        # templates have changed.
         text = file.read_input_text()
-        content = md.convert(text)
-        headers = get_headers(md.toc_tokens)
-        return TableOfContents(headers)
+        if env.cache_dir is None:
+            fragment = self.convert_markdown(text, file, env)
+        else:
+            cache = DiskCache(env.cache_dir, "fragments")
+            key = self.get_fragment_key(text, file, env)
+            cached = self.load_fragment(cache, key)
+            if cached is not None:
+                fragment = cached
+            else:
+                fragment = self.convert_markdown(text, file, env)
+                self.save_fragment(cache, key, fragment)
+
+        file.content = fragment["content"]
+        file.dependencies = fragment["dependencies"]
+        file.search_index = fragment["search_index"]
+        return TableOfContents(get_headers(fragment["toc_tokens"]))
+
+    def convert_markdown(self, text: str, file: File, env: Env) -> dict:
+        """
+        Convert the Markdown `text` of a page, returning a dict of the HTML
+        `content`, and the `toc_tokens`, `dependencies`, and `search_index`.
+        """
+        search_index = self.is_search_enabled(env)
+        md = self.acquire_markdown(search_index)
+        try:
+            # Swap in the per-page URL conversion.
+            url = functools.partial(env.get_url, from_file=file)
+            md.treeprocessors["convert_url"].convert_url = url
+            md.autodoc_cache, md.highlighter = self.get_caches(env)
+            return {
+                "content": md.convert(text),
+                "toc_tokens": md.toc_tokens,
+                "dependencies": list(md.autodoc_dependencies),
+                "search_index": md.search_index if search_index else None,
+            }
+        finally:
+            self.release_markdown(md)
+
+    def get_fragment_key(self, text: str, file: File, env: Env) -> str:
+        """
+        Return the key that a page's converted content is cached with.
+
+        This covers everything that the content depends on, other than any
+        autodoc dependencies, which are checked when the entry is loaded:
+        the Markdown source, the extension configuration, the versions of
+        the libraries that render it, and the links that it might contain.
+        """
+        from mkdocs2 import __version__
+
+        digest = hashlib.sha1()
+        for part in (
+            __version__,
+            markdown.__version__,
+            pygments.__version__,
+            self.autodoc,
+            repr((self.guess_lang, self.default_lang, self.is_search_enabled(env))),
+            file.input_path,
+            env.get_links_digest(),
+            text,
+        ):
+            digest.update(part.encode("utf-8") + b"\0")
+        return f"{FRAGMENT_CACHE_VERSION}:{digest.hexdigest()}"
+
+    def load_fragment(self, cache: DiskCache, key: str) -> typing.Optional[dict]:
+        """
+        Return the cached content for a page, provided that none of its
+        dependencies have changed.
+        """
+        fragment = cache.get(key)
+        if fragment is None:
+            return None
+        dependencies = fragment["dependencies"]
+        if not all(is_unchanged(path, info) for path, info in dependencies.items()):
+            return None
+        fragment["dependencies"] = list(dependencies)
+        return fragment
+
+    def save_fragment(self, cache: DiskCache, key: str, fragment: dict) -> None:
+        dependencies = {path: get_stat_info(path) for path in fragment["dependencies"]}
+        cache.set(key, dict(fragment, dependencies=dependencies))
+
+    def get_caches(self, env: Env) -> typing.Tuple[AutoDocCache, Highlighter]:
+        """
+        Return the autodoc cache and code highlighter for the env's `cache_dir`.
+        """
+        with self.lock:
+            if self._caches is None or self._caches[0].cache_dir != env.cache_dir:
+                self._caches = (
+                    AutoDocCache(env.cache_dir, backend=self.autodoc),
+                    Highlighter(env.cache_dir),
+                )
+            return self._caches
+
+    def is_search_enabled(self, env: Env) -> bool:
+        """
+        Return `True` if any convertor, such as `Search`, uses the search
+        entries of each page.
+        """
+        return any(
+            convertor.uses_search_index for convertor in env.files.get_convertors()
+        )
+
+    def acquire_markdown(self, search_index: bool = False) -> Markdown:
+        """
+        Return a `Markdown` instance from the pool, or create a new one.
+
+        If `search_index` is set, then the instance sets `md.search_index`
+        to the search entries of each document.
+        """
+        with self.lock:
+            if search_index != self._search_index:
+                self._markdown_pool.clear()
+                self._search_index = search_index
+            if self._markdown_pool:
+                return self._markdown_pool.pop()
+        extensions = [
+            TocExtension(permalink=True),
+            AutoDocExtension(),
+            Highlight(guess_lang=self.guess_lang, default_lang=self.default_lang),
+            ConvertURLs(convert_url=lambda url: url),
+        ]  # type: typing.List[typing.Any]
+        if search_index:
+            extensions.append(SearchIndex())
+        return Markdown(extensions=extensions)
+
+    def release_markdown(self, md: Markdown) -> None:
+        """
+        Reset a `Markdown` instance, and return it to the pool.
+        """
+        md.treeprocessors["convert_url"].convert_url = lambda url: url
+        md.reset()
+        with self.lock:
+            if ("search_index" in md.treeprocessors) == self._search_index:
+                self._markdown_pool.append(md)
 
     def convert(self, file: File, env: Env) -> None:
+        assert file.content is not None, "build_toc() must be called before convert()"
         url = functools.partial(env.get_url, from_file=file)
-        current_page = env.nav.lookup_page(file)
-        nav = env.nav
-
-        md = Markdown(
-            extensions=[
-                TocExtension(permalink=True),
-                FencedCodeExtension(),
-                AutoDocExtension(),
-                CodeHiliteExtension(),
-                ConvertURLs(convert_url=url),
-            ]
-        )
-        text = file.read_input_text()
-        content = md.convert(text)
+        nav = env.nav.view(file)
+        current_page = nav.lookup_page(file)
+
         context = {
-            "content": content,
+            "content": file.content,
             "url": url,
             "nav": nav,
             "current_page": current_page,
             "toc": file.toc,
         }
-        html = env.render_template("base.html", context)
-        file.write_output_text(html)
+        with file.open_output_text() as output_file:
+            env.stream_template("base.html", context, output_file)
+        # Release the converted content, now that the page has been written.
+        file.content = None
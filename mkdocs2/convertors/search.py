@@ -0,0 +1,170 @@
+import contextlib
+import json
+import posixpath
+import typing
+import zlib
+from mkdocs2.convertors.markdown_pages import MarkdownPages
+from mkdocs2.search import (
+    MIN_STEM_LENGTH,
+    SHARD_KEYS,
+    SUFFIXES,
+    build_inverted_index,
+    encode_postings,
+    get_shard_key,
+    get_term_frequencies,
+)
+from mkdocs2.types import Convertor, File, Env, TableOfContents
+
+
+class Search(Convertor):
+    """
+    Writes a search index, with an entry for each section of every Markdown page.
+
+    * `path` - The output path of the search index.
+    * `prebuilt` - Also include an inverted index of the entries, so that
+    clients don't need to index the documents on every page load.
+    See `mkdocs2.search.build_inverted_index`.
+    * `shards` - If set, split the index into this many document shards, plus
+    a shard of prebuilt terms for each of `mkdocs2.search.SHARD_KEYS`, so that
+    clients only fetch the shards that a query needs. The index at `path` is
+    then a manifest, listing the shards. See `write_shards`.
+    """
+
+    patterns = []  # type: typing.List[str]
+    uses_search_index = True
+
+    def __init__(
+        self, path: str = "search_index.json", prebuilt: bool = False, shards: int = 0
+    ) -> None:
+        self.path = path
+        self.prebuilt = prebuilt
+        self.shards = shards
+
+    def get_extra_paths(self) -> typing.List[str]:
+        return [self.path]
+
+    def get_pages(self, env: Env) -> typing.List[File]:
+        return [file for file in env.files if isinstance(file.convertor, MarkdownPages)]
+
+    def build_toc(self, file: File, env: Env) -> typing.Optional[TableOfContents]:
+        # The index needs rebuilding whenever any of the pages change.
+        file.dependencies = [page.full_input_path for page in self.get_pages(env)]
+        return None
+
+    def get_search_index(self, page: File, env: Env) -> typing.List[dict]:
+        """
+        Return the search entries for a page, which are gathered when its
+        table of contents is built. Pages that haven't been built, such as
+        unchanged pages in an incremental build, are parsed here instead.
+
+        The entries are released from the page, so that only the pages
+        still to be added to the index are held in memory.
+        """
+        if page.search_index is None:
+            page.toc = page.convertor.build_toc(page, env)
+            page.content = None
+        search_index, page.search_index = page.search_index, None
+        return search_index or []
+
+    def get_docs(self, page: File, env: Env) -> typing.List[dict]:
+        location = page.url.lstrip("/")
+        return [
+            {
+                "location": f"{location}#{entry['ref']}",
+                "title": entry["title"],
+                "text": entry["text"].strip(),
+            }
+            for entry in self.get_search_index(page, env)
+        ]
+
+    def get_doc_path(self, shard: int) -> str:
+        shard_dir = posixpath.splitext(self.path)[0]
+        return f"{shard_dir}/docs-{shard}.json"
+
+    def get_shard_paths(self) -> typing.Tuple[typing.List[str], typing.Dict[str, str]]:
+        """
+        Return the output paths of the document shards, and of the term shards.
+        """
+        shard_dir = posixpath.splitext(self.path)[0]
+        doc_paths = [self.get_doc_path(idx) for idx in range(self.shards)]
+        term_paths = {key: f"{shard_dir}/terms-{key}.json" for key in SHARD_KEYS}
+        return doc_paths, term_paths
+
+    def remove_stale_shards(self, file: File) -> None:
+        """
+        Remove any shards left over from a previous build with more shards,
+        or from a sharded build, if the index is no longer sharded.
+        """
+        shard = self.shards
+        while file.output.exists(self.get_doc_path(shard)):
+            file.output.remove(self.get_doc_path(shard))
+            shard += 1
+        if not self.shards:
+            _, term_paths = self.get_shard_paths()
+            for path in term_paths.values():
+                file.output.remove(path)
+
+    def convert(self, file: File, env: Env) -> None:
+        self.remove_stale_shards(file)
+        if self.shards:
+            self.write_shards(file, env)
+            return
+
+        docs = []
+        for page in self.get_pages(env):
+            docs.extend(self.get_docs(page, env))
+
+        search_index = {"docs": docs}  # type: typing.Dict[str, typing.Any]
+        if self.prebuilt:
+            search_index["index"] = build_inverted_index(docs)
+        file.write_output_text(json.dumps(search_index, separators=(",", ":")))
+
+    def write_shards(self, file: File, env: Env) -> None:
+        """
+        Write the index as a set of shards, and a manifest listing them.
+
+        Each page's documents go in the shard given by a checksum of its URL,
+        so an edit to one page only changes the content of a single document
+        shard. Document ids are `position * shards + shard`, where `position`
+        is the index of the document within its shard.
+
+        Documents are written to their shards as each page is read, so only
+        the postings of the inverted index are held in memory.
+        """
+        doc_paths, term_paths = self.get_shard_paths()
+        postings = {}  # type: typing.Dict[str, typing.List[typing.Tuple[int, int]]]
+        counts = [0] * self.shards
+
+        with contextlib.ExitStack() as stack:
+            doc_files = [
+                stack.enter_context(file.output.open_text(path)) for path in doc_paths
+            ]
+            for page in self.get_pages(env):
+                shard = zlib.crc32(page.url.encode("utf-8")) % self.shards
+                for doc in self.get_docs(page, env):
+                    document_id = counts[shard] * self.shards + shard
+                    doc_files[shard].write("," if counts[shard] else "[")
+                    doc_files[shard].write(json.dumps(doc, separators=(",", ":")))
+                    counts[shard] += 1
+                    for term, frequency in get_term_frequencies(doc).items():
+                        postings.setdefault(term, []).append((document_id, frequency))
+            for shard, doc_file in enumerate(doc_files):
+                doc_file.write("]" if counts[shard] else "[]")
+
+        # Every term shard is written, even if empty, so that none are left
+        # over from a previous build.
+        terms = {key: {} for key in SHARD_KEYS}  # type: typing.Dict[str, dict]
+        for term in sorted(postings):
+            encoded = encode_postings(sorted(postings.pop(term)))
+            terms[get_shard_key(term)][term] = encoded
+        for key, path in term_paths.items():
+            text = json.dumps(terms.pop(key), separators=(",", ":"))
+            file.output.write_text(path, text)
+
+        manifest = {
+            "suffixes": list(SUFFIXES),
+            "min_stem_length": MIN_STEM_LENGTH,
+            "docs": doc_paths,
+            "terms": term_paths,
+        }
+        file.write_output_text(json.dumps(manifest, separators=(",", ":")))
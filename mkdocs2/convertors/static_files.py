@@ -1,11 +1,26 @@
-import shutil
 import typing
+from mkdocs2.file_copy import COMPARE_METHODS, COPY_METHODS
 from mkdocs2.types import Convertor, File, Env, TableOfContents
 
 
 class StaticFiles(Convertor):
-    def should_handle_file(self, input_path: str) -> bool:
-        return True
+    """
+    Copies any files across to the output directory, as they are.
+
+    * `compare` - Skip copying any files which are already up to date in the
+    output directory. Either "mtime" to compare file sizes and modification
+    times, "hash" to compare the file contents, or "none" to always copy.
+    * `method` - Either "copy", "hardlink", or "reflink" for copy-on-write
+    clones. Links and clones fall back to copying if they're not supported.
+    """
+
+    patterns = ["*"]
+
+    def __init__(self, compare: str = "mtime", method: str = "copy") -> None:
+        assert compare in COMPARE_METHODS
+        assert method in COPY_METHODS
+        self.compare = compare
+        self.method = method
 
     def get_output_path(self, input_path: str) -> str:
         return input_path
@@ -17,4 +32,4 @@ class StaticFiles(Convertor):
         return None
 
     def convert(self, file: File, env: Env) -> None:
-        shutil.copy2(file.full_input_path, file.full_output_path)
+        file.copy_input_to_output(compare=self.compare, method=self.method)
@@ -1,18 +1,81 @@
 from mkdocs2 import types
+from mkdocs2.manifest import BuildManifest, get_build_fingerprint
+from mkdocs2.profiling import Profiler
 from urllib.parse import urlparse, urlunparse, urljoin
+import concurrent.futures
 import fnmatch
 import importlib
+import jinja2
 import os
+import re
 import typing
 
 
-def build(config: typing.Dict) -> None:
+def build(
+    config: typing.Dict,
+    incremental: bool = False,
+    jobs: int = 1,
+    profiler: Profiler = None,
+) -> None:
     """
     Builds the documentation.
 
     **Parameters:**
 
     * `config` - A MkDocs configuration dictionary.
+    * `incremental` - If `True`, only rebuild files whose inputs have changed
+    since the previous build, using the manifest stored in the `cache_dir`.
+    The manifest is saved by every build with a `cache_dir`, and without one
+    every build is a full build.
+    * `jobs` - The number of worker processes to build pages with.
+    * `profiler` - If given, record the time taken by each phase of the build.
+    """
+    cache_dir = config["build"].get("cache_dir")
+    template_dir = config["build"]["template_dir"]
+    output = types.DiskOutput(config["build"]["output_dir"])
+    env = load_env(config, output=output, profiler=profiler)
+    files = env.files
+
+    # The manifest is updated by full builds as well, so that it always
+    # matches the outputs for any later incremental build.
+    stale_files = list(files)
+    if cache_dir is not None:
+        manifest = BuildManifest.load(cache_dir)
+        fingerprint = get_build_fingerprint(config, files, template_dir)
+        if incremental:
+            manifest.remove_stale_outputs(files, output)
+            stale_files = [
+                file for file in files if not manifest.is_fresh(file, fingerprint)
+            ]
+
+    if jobs > 1:
+        build_files_in_parallel(stale_files, env, jobs)
+    else:
+        for file in stale_files:
+            build_toc(file, env)
+        for file in stale_files:
+            convert(file, env)
+
+    if cache_dir is not None:
+        # Full builds don't hash every input, so an input that is later
+        # touched without being changed is rebuilt once, and hashed then.
+        for file in stale_files:
+            manifest.record(file, include_hash=incremental)
+        manifest.fingerprint = fingerprint
+        manifest.save(cache_dir)
+
+
+def load_env(
+    config: typing.Dict, output: types.Output = None, profiler: Profiler = None
+) -> types.Env:
+    """
+    Load all of the build information, without building any of the files.
+
+    **Parameters:**
+
+    * `config` - A MkDocs configuration dictionary.
+    * `output` - Where to write the built files. Defaults to the output directory.
+    * `profiler` - If given, record the time taken to load the files and nav.
     """
     base_url = config["build"].get("url")
     input_dir = config["build"]["input_dir"]
@@ -20,67 +83,209 @@ def build(config: typing.Dict) -> None:
     template_dir = config["build"]["template_dir"]
     nav_info = config.get("nav", {})
 
+    if output is None:
+        output = types.DiskOutput(output_dir)
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+
     convertors = []
     for convertor_info in config["convertors"]:
-        cls = import_from_string(convertor_info)
+        if isinstance(convertor_info, dict):
+            # Convertors may be configured with options.
+            # Eg. `{"mkdocs2.convertors.StaticFiles": {"method": "hardlink"}}`
+            ((import_str, options),) = convertor_info.items()
+        else:
+            import_str, options = convertor_info, {}
+        cls = import_from_string(import_str)
         assert issubclass(cls, types.Convertor)
-        convertors.append(cls())
+        convertors.append(cls(**(options or {})))
 
-    files = gather_files(
-        input_dir=input_dir, output_dir=output_dir, convertors=convertors
+    with profiler.measure("gather_files", "gather_files"):
+        files = gather_files(
+            input_dir=input_dir,
+            output_dir=output_dir,
+            convertors=convertors,
+            output=output,
+            ignore=config["build"].get("ignore", []),
+            threads=config["build"].get("scan_threads", 1),
+        )
+    with profiler.measure("load_nav", "load_nav"):
+        nav = load_nav(nav_info, files, base_url)
+    return types.Env(
+        files,
+        nav,
+        template_dir,
+        base_url,
+        config=config,
+        output=output,
+        profiler=profiler,
     )
-    nav = load_nav(nav_info, files, base_url)
-    env = types.Env(files, nav, template_dir, base_url, config=config)
-    for file in files:
+
+
+def compile_templates(config: typing.Dict, target_dir: str) -> None:
+    """
+    Compile the templates into a directory of Python modules, which may be
+    used instead of the template sources by setting `compiled_templates`
+    in the `build` config.
+
+    The compiled templates need recompiling whenever the sources change.
+    """
+    template_dir = config["build"]["template_dir"]
+    template_env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_dir))
+    template_env.compile_templates(target_dir, zip=None, ignore_errors=False)
+
+
+def build_file(file: types.File, env: types.Env) -> None:
+    """
+    Build a single file, on its own.
+    """
+    build_toc(file, env)
+    convert(file, env)
+
+
+def build_toc(file: types.File, env: types.Env) -> None:
+    """
+    Build the table of contents for a file, recording the time taken.
+    """
+    convertor = file.convertor.__class__.__name__
+    with env.profiler.measure(file.output_path, "build_toc", convertor=convertor):
         file.toc = file.convertor.build_toc(file, env)
 
-    for file in files:
-        dirname = os.path.dirname(file.full_output_path)
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
-        nav.activate(file)
+
+def convert(file: types.File, env: types.Env) -> None:
+    """
+    Convert a file to its output, recording the time taken.
+    """
+    convertor = file.convertor.__class__.__name__
+    with env.profiler.measure(file.output_path, "convert", convertor=convertor):
         file.convertor.convert(file, env)
-        nav.deactivate()
+
+
+# The build information for the current worker process. Set once, when each
+# worker is started, rather than being sent along with every task.
+_worker_env = None  # type: typing.Optional[types.Env]
+
+
+def _init_worker(env: types.Env) -> None:  # pragma: nocover
+    global _worker_env
+    _worker_env = env
+
+
+def _build_toc_worker(index: int) -> typing.Tuple[dict, list]:  # pragma: nocover
+    """
+    Build the table of contents for a single file, returning the file state so
+    that it can be copied back to the main process, along with any profiling
+    events recorded.
+    """
+    env = typing.cast(types.Env, _worker_env)
+    env.profiler.events = []
+    file = env.files[index]
+    build_toc(file, env)
+    state = {
+        key: value
+        for key, value in vars(file).items()
+        if key not in ("convertor", "output")
+    }
+    return state, env.profiler.events
+
+
+def _convert_worker(
+    task: typing.Tuple[int, typing.Optional[str]],
+) -> list:  # pragma: nocover
+    env = typing.cast(types.Env, _worker_env)
+    env.profiler.events = []
+    index, content = task
+    file = env.files[index]
+    file.content = content
+    convert(file, env)
+    return env.profiler.events
+
+
+def build_files_in_parallel(
+    files: typing.List[types.File], env: types.Env, jobs: int
+) -> None:
+    """
+    Build the given files across a pool of `jobs` worker processes.
+
+    All of the tables of contents are built before any pages are rendered,
+    just as with a serial build. Each phase uses its own pool, so that the
+    workers rendering pages have a snapshot of the env that includes every
+    file's table of contents.
+
+    Each page's content is sent only with the task that renders it, rather
+    than in the snapshot. Files whose convertor reads the search index of
+    every page are rendered in this process, once the pool has finished.
+    """
+    positions = {id(file): idx for idx, file in enumerate(env.files)}
+    indexes = [positions[id(file)] for file in files]
+    chunksize = max(1, len(indexes) // (jobs * 4))
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(env,)
+    ) as executor:
+        results = executor.map(_build_toc_worker, indexes, chunksize=chunksize)
+        for file, (state, events) in zip(files, results):
+            vars(file).update(state)
+            env.profiler.events.extend(events)
+
+    tasks = []
+    for file in files:
+        if not file.convertor.uses_search_index:
+            tasks.append((positions[id(file)], file.content))
+    search_indexes = [file.search_index for file in env.files]
+    for file in env.files:
+        file.content = None
+        file.search_index = None
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(env,)
+        ) as executor:
+            for events in executor.map(_convert_worker, tasks, chunksize=chunksize):
+                env.profiler.events.extend(events)
+    finally:
+        for file, search_index in zip(env.files, search_indexes):
+            file.search_index = search_index
+
+    for file in files:
+        if file.convertor.uses_search_index:
+            convert(file, env)
 
 
 def gather_files(
     input_dir: str,
     output_dir: str,
     convertors: typing.List[types.Convertor],
-    sub_dir: str = "",
+    output: types.Output = None,
+    ignore: typing.Sequence[str] = (),
+    threads: int = 1,
 ) -> types.Files:
     """
     Determine all of the files in the input directory.
+
+    **Parameters:**
+
+    * `ignore` - Glob patterns for any files or directories to skip, in
+    addition to `DEFAULT_IGNORE`. See `walk_input_dir`.
+    * `threads` - The number of threads to scan directories with.
     """
 
     files = types.Files()
-    dirname = os.path.join(input_dir, sub_dir)
-    for basename in sorted(os.listdir(dirname)):
-        path = os.path.join(dirname, basename)
-        if os.path.isdir(path):
-            # Descend into sub-directories.
-            next_sub_dir = os.path.join(sub_dir, basename)
-            files += gather_files(
+    get_convertor = compile_convertor_patterns(convertors)
+    for input_path in walk_input_dir(input_dir, ignore=ignore, threads=threads):
+        #  Determine if there are any convertors that handle the given file.
+        convertor = get_convertor(input_path)
+        if convertor is not None:
+            output_path = convertor.get_output_path(input_path)
+            file = types.File(
+                input_path=input_path,
+                output_path=output_path,
                 input_dir=input_dir,
                 output_dir=output_dir,
-                convertors=convertors,
-                sub_dir=next_sub_dir,
+                convertor=convertor,
+                output=output,
             )
-        else:
-            #  Determine if there are any convertors that handle the given file.
-            input_path = os.path.join(sub_dir, basename)
-            for convertor in convertors:
-                if convertor.should_handle_file(input_path):
-                    output_path = convertor.get_output_path(input_path)
-                    file = types.File(
-                        input_path=input_path,
-                        output_path=output_path,
-                        input_dir=input_dir,
-                        output_dir=output_dir,
-                        convertor=convertor,
-                    )
-                    files.append(file)
-                    break
+            convertor.prepare_file(file)
+            files.append(file)
 
     # Add any extra files that are provided by a convertor class.
     for convertor in convertors:
@@ -91,12 +296,146 @@ def gather_files(
                 input_dir="",
                 output_dir=output_dir,
                 convertor=convertor,
+                output=output,
             )
+            convertor.prepare_file(file)
             files.append(file)
 
     return files
 
 
+# Directories that are never walked, in addition to any configured patterns.
+DEFAULT_IGNORE = (".git", ".hg", ".svn", "node_modules", "__pycache__")
+
+
+def walk_input_dir(
+    input_dir: str, ignore: typing.Sequence[str] = (), threads: int = 1
+) -> typing.List[str]:
+    """
+    Return the paths of all the files in `input_dir`, relative to it.
+
+    Each directory is listed in sorted order, with the contents of any
+    sub-directories listed in place, just as a depth-first walk would.
+
+    Any files or directories matching `DEFAULT_IGNORE` or the `ignore` glob
+    patterns are skipped, so ignored directories are never walked. Patterns
+    containing a "/" are matched against the path relative to `input_dir`,
+    and other patterns against the file or directory name.
+    Eg. `ignore=["*.tmp", "drafts/**"]`
+
+    If `threads` is greater than one, then directories are scanned
+    concurrently, which helps on network file systems.
+    """
+    is_ignored = compile_ignore_patterns(list(DEFAULT_IGNORE) + list(ignore))
+    executor = None  # type: typing.Optional[concurrent.futures.ThreadPoolExecutor]
+    scans = {}  # type: typing.Dict[str, concurrent.futures.Future]
+
+    def scan(sub_dir: str) -> typing.List[typing.Tuple[str, str, bool]]:
+        entries = []
+        with os.scandir(os.path.join(input_dir, sub_dir)) as iterator:
+            for entry in iterator:
+                path = os.path.join(sub_dir, entry.name)
+                if not is_ignored(entry.name, path):
+                    # `DirEntry.is_dir()` uses the information returned when
+                    # listing the directory, rather than another `stat` call.
+                    entries.append((entry.name, path, entry.is_dir()))
+        entries.sort()
+        if executor is not None:
+            # Start scanning any sub-directories straight away.
+            for name, path, is_dir in entries:
+                if is_dir:
+                    scans[path] = executor.submit(scan, path)
+        return entries
+
+    def walk(sub_dir: str) -> typing.Iterator[str]:
+        if executor is None:
+            entries = scan(sub_dir)
+        else:
+            entries = scans[sub_dir].result()
+        for name, path, is_dir in entries:
+            if is_dir:
+                yield from walk(path)
+            else:
+                yield path
+
+    if threads <= 1:
+        return list(walk(""))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        scans[""] = executor.submit(scan, "")
+        return list(walk(""))
+
+
+def compile_ignore_patterns(
+    patterns: typing.Sequence[str],
+) -> typing.Callable[[str, str], bool]:
+    """
+    Compile a list of glob patterns into a single function, that returns
+    `True` if either the given name or relative path should be ignored.
+    """
+    name_patterns = [fnmatch.translate(pat) for pat in patterns if "/" not in pat]
+    path_patterns = [fnmatch.translate(pat) for pat in patterns if "/" in pat]
+    match_name = re.compile("|".join(name_patterns) or "(?!)").match
+    match_path = re.compile("|".join(path_patterns) or "(?!)").match
+
+    def is_ignored(name: str, path: str) -> bool:
+        if match_name(name):
+            return True
+        return bool(path_patterns) and bool(match_path(path.replace(os.sep, "/")))
+
+    return is_ignored
+
+
+def compile_convertor_patterns(
+    convertors: typing.List[types.Convertor],
+) -> typing.Callable[[str], typing.Optional[types.Convertor]]:
+    """
+    Return a function that determines which convertor should handle a given
+    input path, or `None` if no convertor handles it.
+
+    The first convertor that handles a path takes priority. The `patterns` of
+    consecutive convertors are compiled together into a single regex, with a
+    named group for each convertor. Convertors that override
+    `should_handle_file` are called in turn, in their place in the list.
+    """
+    # A list of either compiled regexes, or convertors with custom matching.
+    matchers = []  # type: typing.List[typing.Any]
+    group_names = {}  # type: typing.Dict[str, types.Convertor]
+    regex_parts = []  # type: typing.List[str]
+
+    def flush_regex() -> None:
+        if regex_parts:
+            matchers.append(re.compile("|".join(regex_parts)))
+            regex_parts.clear()
+
+    for idx, convertor in enumerate(convertors):
+        custom = (
+            type(convertor).should_handle_file is not types.Convertor.should_handle_file
+        )
+        if custom or convertor.patterns is None:
+            flush_regex()
+            matchers.append(convertor)
+        elif convertor.patterns:
+            group_name = f"convertor{idx}"
+            group_names[group_name] = convertor
+            pattern = "|".join(fnmatch.translate(pat) for pat in convertor.patterns)
+            regex_parts.append(f"(?P<{group_name}>{pattern})")
+    flush_regex()
+
+    def get_convertor(input_path: str) -> typing.Optional[types.Convertor]:
+        for matcher in matchers:
+            if isinstance(matcher, types.Convertor):
+                if matcher.should_handle_file(input_path):
+                    return matcher
+            else:
+                match = matcher.match(input_path)
+                if match is not None:
+                    return group_names[match.lastgroup]
+        return None
+
+    return get_convertor
+
+
 def load_nav(nav_info: dict, files: types.Files, base_url: str = None) -> types.Nav:
     """
     Determine the navigation info.
@@ -127,7 +466,7 @@ def import_from_string(import_str: str) -> typing.Any:
     try:
         module = importlib.import_module(module_str)
     except ImportError as exc:
-        module_name = module_str.split('.', 1)[0]
+        module_name = module_str.split(".", 1)[0]
         if exc.name != module_name:
             raise exc from None
         raise ValueError(f"Could not import module {module_str!r}.")
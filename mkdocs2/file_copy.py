@@ -0,0 +1,109 @@
+import hashlib
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # pragma: nocover
+    fcntl = None  # type: ignore
+
+
+# The Linux `ioctl` request for cloning a file's extents, on file systems
+# which support copy-on-write, such as Btrfs and XFS.
+FICLONE = 0x40049409
+
+COPY_METHODS = ("copy", "hardlink", "reflink")
+COMPARE_METHODS = ("none", "mtime", "hash")
+
+
+def hash_file(path: str) -> str:
+    """
+    Return a hex digest of the contents of the file at `path`.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_same_file(source: str, destination: str, compare: str) -> bool:
+    """
+    Return `True` if `destination` is already an up to date copy of `source`.
+
+    * `compare="mtime"` - Compare the file sizes and modification times.
+    * `compare="hash"` - Compare the file contents.
+    """
+    assert compare in COMPARE_METHODS
+    if compare == "none":
+        return False
+    try:
+        destination_stat = os.stat(destination)
+    except OSError:
+        return False
+    source_stat = os.stat(source)
+    if source_stat.st_size != destination_stat.st_size:
+        return False
+    if compare == "mtime":
+        return source_stat.st_mtime_ns == destination_stat.st_mtime_ns
+    return hash_file(source) == hash_file(destination)
+
+
+def copy_file(source: str, destination: str, method: str = "copy") -> None:
+    """
+    Copy the file at `source` to `destination`, preserving its modification time.
+
+    * `method="copy"` - A regular copy.
+    * `method="hardlink"` - Link the destination to the source file.
+    * `method="reflink"` - A copy-on-write clone, where the file system
+      supports it, otherwise an in-kernel copy.
+
+    Links and clones fall back to a regular copy if they're not supported.
+    """
+    assert method in COPY_METHODS
+    # Always replace any existing file, rather than writing into it, since it
+    # may be a link to the source file, from an earlier "hardlink" copy.
+    if os.path.lexists(destination):
+        os.remove(destination)
+
+    if method == "hardlink":
+        try:
+            os.link(source, destination)
+            return
+        except OSError:  # pragma: nocover
+            pass
+    elif method == "reflink":
+        try:
+            clone_file(source, destination)
+            shutil.copystat(source, destination)
+            return
+        except OSError:  # pragma: nocover
+            pass
+    shutil.copy2(source, destination)
+
+
+def clone_file(source: str, destination: str) -> None:
+    """
+    Copy a file without passing its contents through user space, using
+    `FICLONE` if possible, or `copy_file_range` otherwise.
+
+    Raises `OSError` if neither is supported.
+    """
+    with open(source, "rb") as source_file, open(destination, "wb") as dest_file:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dest_file.fileno(), FICLONE, source_file.fileno())
+                return  # pragma: nocover
+            except OSError:
+                pass
+
+        if not hasattr(os, "copy_file_range"):  # pragma: nocover
+            raise OSError("copy_file_range is not supported.")
+        remaining = os.fstat(source_file.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(
+                source_file.fileno(), dest_file.fileno(), remaining
+            )
+            if copied == 0:  # pragma: nocover
+                break
+            remaining -= copied
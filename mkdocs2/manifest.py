@@ -0,0 +1,166 @@
+from mkdocs2 import types
+from mkdocs2.file_copy import hash_file
+import hashlib
+import json
+import os
+import typing
+
+MANIFEST_PATH = "manifest.json"
+
+
+def get_stat_info(path: str, include_hash: bool = True) -> typing.Dict:
+    """
+    Return the information we record for each input path, in order to
+    determine if it has changed between builds.
+
+    If `include_hash` is not set, then the file isn't read, and any change
+    to its mtime or size counts as a change to the file.
+    """
+    stat = os.stat(path)
+    return {
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "hash": hash_file(path) if include_hash else None,
+    }
+
+
+def is_unchanged(path: str, info: typing.Dict) -> bool:
+    """
+    Return `True` if the file at `path` still matches the recorded `info`.
+
+    We first compare mtime and size, and only fall back to hashing the
+    file contents if those differ.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_mtime == info["mtime"] and stat.st_size == info["size"]:
+        return True
+    return info["hash"] is not None and hash_file(path) == info["hash"]
+
+
+def get_convertor_name(convertor: types.Convertor) -> str:
+    cls = type(convertor)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def get_build_fingerprint(
+    config: typing.Dict, files: types.Files, template_dir: str
+) -> str:
+    """
+    Return a digest of everything that every output file depends on:
+    the configuration, the templates, including any compiled templates,
+    and the set of files in the site.
+
+    If any of these change then every file needs to be rebuilt, since they
+    affect the page layout, the navigation, and how links are resolved.
+    """
+    from mkdocs2 import __version__
+
+    digest = hashlib.sha1()
+    digest.update(__version__.encode("utf-8"))
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    template_dirs = [template_dir]
+    compiled_templates = config["build"].get("compiled_templates")
+    if compiled_templates is not None:
+        template_dirs.append(compiled_templates)
+    for directory in template_dirs:
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                digest.update(os.path.relpath(path, directory).encode("utf-8"))
+                digest.update(hash_file(path).encode("utf-8"))
+    for file in files:
+        digest.update(f"{file.input_path}\0{file.output_path}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """
+    Records the inputs that each output file was built from, so that an
+    incremental build can skip any files that are unchanged.
+
+    The manifest is stored in the cache directory, so that it isn't deployed
+    along with the built site.
+    """
+
+    def __init__(
+        self, fingerprint: str = "", entries: typing.Dict[str, typing.Dict] = None
+    ) -> None:
+        self.fingerprint = fingerprint
+        # A lookup of `output_path` -> information on the inputs it was built from.
+        self.entries = {} if entries is None else entries
+
+    @classmethod
+    def load(cls, cache_dir: str) -> "BuildManifest":
+        """
+        Load the manifest from a previous build, or return an empty manifest
+        if there isn't one.
+        """
+        path = os.path.join(cache_dir, MANIFEST_PATH)
+        try:
+            with open(path, "r") as manifest_file:
+                data = json.load(manifest_file)
+        except (OSError, ValueError):
+            return cls()
+        return cls(fingerprint=data["fingerprint"], entries=data["entries"])
+
+    def save(self, cache_dir: str) -> None:
+        path = os.path.join(cache_dir, MANIFEST_PATH)
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        data = {"fingerprint": self.fingerprint, "entries": self.entries}
+        with open(path, "w") as manifest_file:
+            json.dump(data, manifest_file, sort_keys=True)
+
+    def is_fresh(self, file: types.File, fingerprint: str) -> bool:
+        """
+        Return `True` if `file` was built by a previous build, and none of its
+        inputs or dependencies have changed since.
+        """
+        entry = self.entries.get(file.output_path)
+        if (
+            entry is None
+            or fingerprint != self.fingerprint
+            or entry["input_path"] != file.input_path
+            or entry["input_dir"] != file.input_dir
+            or entry["convertor"] != get_convertor_name(file.convertor)
+            or not file.output.exists(file.output_path)
+        ):
+            return False
+        if file.input_path and not is_unchanged(file.full_input_path, entry["input"]):
+            return False
+        return all(
+            is_unchanged(path, info) for path, info in entry["dependencies"].items()
+        )
+
+    def record(self, file: types.File, include_hash: bool = True) -> None:
+        """
+        Record the inputs and dependencies for a file that has just been built.
+        See `get_stat_info` for `include_hash`.
+        """
+        self.entries[file.output_path] = {
+            "input_path": file.input_path,
+            "input_dir": file.input_dir,
+            "convertor": get_convertor_name(file.convertor),
+            "input": (
+                get_stat_info(file.full_input_path, include_hash)
+                if file.input_path
+                else None
+            ),
+            "dependencies": {
+                path: get_stat_info(path, include_hash) for path in file.dependencies
+            },
+        }
+
+    def remove_stale_outputs(self, files: types.Files, output: types.Output) -> None:
+        """
+        Delete any previously built outputs which no longer have a source file.
+        """
+        output_paths = {file.output_path for file in files}
+        for output_path in list(self.entries):
+            if output_path not in output_paths:
+                output.remove(output_path)
+                del self.entries[output_path]
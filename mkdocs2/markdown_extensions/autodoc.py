@@ -2,9 +2,16 @@ from markdown import Markdown
 from markdown.extensions import Extension
 from markdown.blockprocessors import BlockProcessor
 from markdown.util import etree
+from mkdocs2.cache import DiskCache, PicklableLock
 from mkdocs2.core import import_from_string
+from mkdocs2.manifest import get_stat_info, is_unchanged
 import inspect
+import json
+import os
 import re
+import subprocess
+import sys
+import threading
 import typing
 
 
@@ -12,6 +19,14 @@ import typing
 # attribute assignments.  Eg. `self.counter = 0`
 SET_ATTRIBUTE = re.compile('^([ \t]*)self[.]([A-Za-z0-9_]+) *=')
 
+# Bump this whenever the information returned by `introspect()` changes.
+AUTODOC_CACHE_VERSION = 1
+
+# The stat info of each source file, as of when this process first imported
+# it. Modules stay in `sys.modules` for the life of the process, so this is
+# shared by every `AutoDocCache`.
+IMPORTED_SOURCES = {}  # type: typing.Dict[str, typing.Dict[str, typing.Any]]
+
 
 def get_params(signature: inspect.Signature) -> typing.List[str]:
     """
@@ -100,6 +115,144 @@ def trim_docstring(docstring: typing.Optional[str]) -> str:
     return '\n'.join(trimmed)
 
 
+def get_item_info(item: typing.Any) -> typing.Dict[str, typing.Any]:
+    """
+    Return the information needed to render the signature and docstring of
+    `item`. Items without a signature, such as constants, have `params=None`.
+    """
+    try:
+        params = get_params(inspect.signature(item))  # type: typing.Optional[typing.List[str]]
+    except (TypeError, ValueError):
+        params = None
+    return {
+        'is_class': inspect.isclass(item),
+        'params': params,
+        'docstring': trim_docstring(item.__doc__),
+    }
+
+
+def get_source_paths(item: typing.Any) -> typing.List[str]:
+    """
+    Return the source files that documentation for `item` is generated from.
+    For classes this includes the modules of any base classes, since their
+    members are documented too.
+    """
+    items = inspect.getmro(item) if inspect.isclass(item) else (item,)
+    paths = []
+    for obj in items:
+        module = inspect.getmodule(obj)
+        path = getattr(module, '__file__', None)
+        if path and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def introspect(import_string: str) -> typing.Dict[str, typing.Any]:
+    """
+    Import the item at `import_string`, and return everything needed to
+    document it, as JSON serializable data.
+    """
+    item = import_from_string(import_string)
+    info = get_item_info(item)
+    info['members'] = []
+    for attribute_name in dir(item):
+        if not attribute_name.startswith('_'):
+            attribute = getattr(item, attribute_name)
+            if hasattr(attribute, '__doc__'):
+                member = get_item_info(attribute)
+                member['name'] = attribute_name
+                info['members'].append(member)
+    info['sources'] = get_source_paths(item)
+    return info
+
+
+class AutoDocCache(PicklableLock):
+    """
+    Memoizes the inspection of each item, in memory and in `cache_dir`.
+    """
+
+    def __init__(self, cache_dir: str = None, backend: str = 'import') -> None:
+        from mkdocs2.markdown_extensions.autodoc_static import StaticInspector
+
+        # Either "import" to import each item, or "static" to parse the
+        # source files. See `autodoc_static.StaticInspector`.
+        assert backend in ('import', 'static')
+        self.cache_dir = cache_dir
+        self.backend = backend
+        self.disk_cache = None if cache_dir is None else DiskCache(cache_dir, 'autodoc')
+        self.static_inspector = StaticInspector() if backend == 'static' else None
+        self.entries = {}  # type: typing.Dict[str, typing.Dict[str, typing.Any]]
+        self.lock = threading.Lock()
+
+    def get(self, import_string: str) -> typing.Dict[str, typing.Any]:
+        key = f'{AUTODOC_CACHE_VERSION}:{self.backend}:{import_string}'
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None and self.disk_cache is not None:
+            entry = self.disk_cache.get(key)
+
+        if entry is not None and all(
+            is_unchanged(path, stat_info)
+            for path, stat_info in entry['sources'].items()
+        ):
+            with self.lock:
+                self.entries[key] = entry
+            return entry['info']
+
+        is_imported = False
+        if self.static_inspector is not None:
+            info = self.static_inspector.introspect(import_string)
+        elif has_stale_imports():
+            info = introspect_in_subprocess(import_string)
+        else:
+            info = introspect(import_string)
+            is_imported = True
+        entry = {
+            'sources': {path: get_stat_info(path) for path in info['sources']},
+            'info': info,
+        }
+        if is_imported:
+            for path, stat_info in entry['sources'].items():
+                IMPORTED_SOURCES.setdefault(path, stat_info)
+        with self.lock:
+            self.entries[key] = entry
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, entry)
+        return info
+
+
+def has_stale_imports() -> bool:
+    """
+    Return `True` if any source file has changed since it was imported.
+
+    Reloading just the changed modules isn't enough, since any modules that
+    depend on them, such as those defining subclasses, would still refer to
+    the stale copies.
+    """
+    return any(
+        not is_unchanged(path, stat_info)
+        for path, stat_info in list(IMPORTED_SOURCES.items())
+    )
+
+
+def introspect_in_subprocess(import_string: str) -> typing.Dict[str, typing.Any]:
+    """
+    Run `introspect()` in a fresh interpreter, so that the current source
+    files are imported, rather than any stale modules in this process.
+    """
+    script = (
+        'import json, sys\n'
+        'from mkdocs2.markdown_extensions.autodoc import introspect\n'
+        'json.dump(introspect(sys.argv[1]), sys.stdout)\n'
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.run(
+        [sys.executable, '-c', script, import_string],
+        env=env, stdout=subprocess.PIPE, check=True
+    ).stdout
+    return json.loads(output)
+
+
 # def guess_instance_attributes(cls: type) -> typing.Dict[str, str]:
 #     """
 #     Given a class, return a dictionary of {attribute_name: comment}, based
@@ -151,18 +304,18 @@ class AutoDocProcessor(BlockProcessor):
 
         if m:
             import_string = m.group(1)
-            item = import_from_string(import_string)
+            info = self.parser.md.autodoc_cache.get(import_string)
+            self.record_dependencies(info)
 
             autodoc_div = etree.SubElement(parent, 'div')
             autodoc_div.set('class', self.CLASSNAME)
 
-            self.render_signature(autodoc_div, item, import_string)
+            self.render_signature(autodoc_div, info, import_string)
             for line in block.splitlines():
                 if line.startswith(":docstring:"):
-                    docstring = trim_docstring(item.__doc__)
-                    self.render_docstring(autodoc_div, item, docstring)
+                    self.render_docstring(autodoc_div, info['docstring'])
                 elif line.startswith(":members:"):
-                    self.render_members(autodoc_div, item)
+                    self.render_members(autodoc_div, info)
 
         #else:
         #    self.parser.parseChunk(sibling, block)
@@ -173,15 +326,24 @@ class AutoDocProcessor(BlockProcessor):
             # list for future processing.
             blocks.insert(0, theRest)
 
-    def render_signature(self, elem: etree.Element, item: typing.Any, import_string: str) -> None:
+    def record_dependencies(self, info: typing.Dict[str, typing.Any]) -> None:
+        """
+        Note the source files that the documentation was generated from, so
+        that the page can be rebuilt whenever they change.
+        """
+        dependencies = self.parser.md.autodoc_dependencies
+        for path in info['sources']:
+            if path not in dependencies:
+                dependencies.append(path)
+
+    def render_signature(self, elem: etree.Element, info: typing.Dict[str, typing.Any], import_string: str) -> None:
         module_string, _, name_string = import_string.rpartition('.')
-        signature = inspect.signature(item)
 
         # Eg: `some_module.attribute_name`
         signature_elem = etree.SubElement(elem, 'p')
         signature_elem.set('class', 'autodoc-signature')
 
-        if inspect.isclass(item):
+        if info['is_class']:
             qualifier_elem = etree.SubElement(signature_elem, 'em')
             qualifier_elem.text = "class "
 
@@ -193,12 +355,15 @@ class AutoDocProcessor(BlockProcessor):
         name_elem.text = name_string
         name_elem.set('class', 'autodoc-name')
 
+        if info['params'] is None:
+            return
+
         # Eg: `(a, b='default', **kwargs)``
         bracket_elem = etree.SubElement(signature_elem, 'span')
         bracket_elem.text = '('
         bracket_elem.set('class', 'autodoc-punctuation')
 
-        for param, is_last in last_iter(get_params(signature)):
+        for param, is_last in last_iter(info['params']):
             param_elem = etree.SubElement(signature_elem, 'em')
             param_elem.text = param
             param_elem.set('class', 'autodoc-param')
@@ -212,36 +377,44 @@ class AutoDocProcessor(BlockProcessor):
         bracket_elem.text = ')'
         bracket_elem.set('class', 'autodoc-punctuation')
 
-    def render_docstring(self, elem: etree.Element, item: typing.Any, docstring: str) -> None:
+    def render_docstring(self, elem: etree.Element, docstring: str) -> None:
         docstring_elem = etree.SubElement(elem, 'div')
         docstring_elem.set('class', 'autodoc-docstring')
         self.parser.parseChunk(docstring_elem, docstring)
 
-    def render_members(self, elem: etree.Element, item: typing.Any) -> None:
+    def render_members(self, elem: etree.Element, info: typing.Dict[str, typing.Any]) -> None:
         members_elem = etree.SubElement(elem, 'div')
         members_elem.set('class', 'autodoc-members')
 
-        members = {}
-
-        for attribute_name in dir(item):
-            if not attribute_name.startswith('_'):
-                attribute = getattr(item, attribute_name)
-                if hasattr(attribute, '__doc__'):
-                    members[attribute_name] = trim_docstring(attribute.__doc__)
-
         # if inspect.isclass(item):
         #    for attribute_name, comment in guess_instance_attributes(item).items():
         #        if attribute_name not in members:
         #            members[attribute_name] = comment
 
-        for attribute_name, docs in members.items():
-            attribute = getattr(item, attribute_name)
-            self.render_signature(members_elem, attribute, attribute_name)
-            self.render_docstring(members_elem, attribute, docs)
+        for member in info['members']:
+            self.render_signature(members_elem, member, member['name'])
+            self.render_docstring(members_elem, member['docstring'])
 
 
 
 class AutoDocExtension(Extension):
+    """
+    Renders documentation for the items referenced by `:::` directives.
+
+    Pass a `cache` to share inspected items with other instances.
+    """
+
+    def __init__(self, cache: AutoDocCache = None) -> None:
+        super().__init__()
+        self.cache = AutoDocCache() if cache is None else cache
+
     def extendMarkdown(self, md: Markdown) -> None:
+        self.md = md
+        md.autodoc_cache = self.cache
         md.registerExtension(self)
         md.parser.blockprocessors.register(AutoDocProcessor(md.parser), 'autodoc', 110)
+        self.reset()
+
+    def reset(self) -> None:
+        # The source files of any modules referenced by the document.
+        self.md.autodoc_dependencies = []
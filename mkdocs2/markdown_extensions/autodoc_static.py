@@ -0,0 +1,455 @@
+from mkdocs2.markdown_extensions.autodoc import get_params, trim_docstring
+import ast
+import importlib.util
+import inspect
+import os
+import sys
+import typing
+
+
+# How many `from module import name` re-exports to follow, when resolving a name.
+MAX_IMPORT_DEPTH = 10
+
+# The nodes that a parameter default may contain, to be evaluated statically.
+CONSTANT_NODES = (
+    ast.Constant,
+    ast.Name,
+    ast.Load,
+    ast.Tuple,
+    ast.List,
+    ast.Set,
+    ast.Dict,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.operator,
+    ast.unaryop,
+)
+
+
+# Decorators that define the accessors of a property. Eg. `@size.setter`
+PROPERTY_ACCESSORS = {"getter", "setter", "deleter"}
+
+
+class SourceDefault:
+    """
+    Stands in for a parameter default that can't be evaluated statically,
+    so that it's rendered using its source code. Eg. `timeout=object()`
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+
+    def __repr__(self) -> str:
+        return self.source
+
+
+class ModuleSource:
+    """
+    A parsed source file, along with a lookup of its top level names.
+
+    Each name maps either to the AST node that defines it, or for imported
+    names to a `(module_name, attribute_name)` tuple, where `attribute_name`
+    is `None` for modules. Modules imported with `from module import *` are
+    listed in `star_imports`.
+    """
+
+    def __init__(self, name: str, path: str, source: str, tree: ast.Module) -> None:
+        self.name = name
+        self.path = path
+        self.source = source
+        self.tree = tree
+        self.names = {}  # type: typing.Dict[str, typing.Any]
+        self.star_imports = []  # type: typing.List[str]
+
+        is_package = os.path.basename(path) == "__init__.py"
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.names[node.name] = node
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        self.names[target.id] = node
+            elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                self.names[node.target.id] = node
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        self.names[alias.asname] = (alias.name, None)
+                    else:
+                        top_level = alias.name.partition(".")[0]
+                        self.names[top_level] = (top_level, None)
+            elif isinstance(node, ast.ImportFrom):
+                module_name = node.module or ""
+                if node.level:
+                    # Resolve relative imports against this module's package.
+                    package = name if is_package else name.rpartition(".")[0]
+                    for _ in range(node.level - 1):
+                        package = package.rpartition(".")[0]
+                    module_name = ".".join(
+                        part for part in (package, module_name) if part
+                    )
+                for alias in node.names:
+                    if alias.name == "*":
+                        self.star_imports.append(module_name)
+                    else:
+                        self.names[alias.asname or alias.name] = (
+                            module_name,
+                            alias.name,
+                        )
+
+
+class StaticInspector:
+    """
+    Provides the same information as `autodoc.introspect()`, by parsing
+    source files with `ast`, rather than importing them.
+
+    This avoids running any import time code, but has some limitations:
+
+    * Parameter defaults are evaluated if they're constant expressions, or
+      names of module level constants. Any others are shown as their source code.
+    * Class attributes are documented without any docstring.
+    * Only names that can be resolved statically are documented, so base
+      classes or re-exports that are created dynamically won't be followed.
+
+    Parsed files are cached, until they change on disk.
+    """
+
+    def __init__(self) -> None:
+        # A lookup of `path` -> `((mtime, size), ModuleSource)`.
+        self.parsed = {}  # type: typing.Dict[str, typing.Tuple[tuple, ModuleSource]]
+        self.module_paths = {}  # type: typing.Dict[str, typing.Optional[str]]
+
+    def introspect(self, import_string: str) -> typing.Dict[str, typing.Any]:
+        module_str, _, attr_str = import_string.rpartition(".")
+        if self.get_module(module_str) is None:
+            raise ValueError(f"Could not find module {module_str!r}.")
+        resolved = self.resolve(module_str, attr_str)
+        if resolved is None:
+            msg = f"Attribute {attr_str!r} not found in module {module_str!r}."
+            raise ValueError(msg)
+        module, node = resolved
+
+        sources = [module.path]
+        info = self.get_item_info(module, node, sources)
+        info["members"] = []
+        for name, (member_module, member) in sorted(self.get_members(module, node)):
+            if not name.startswith("_"):
+                member_info = self.get_item_info(
+                    member_module, member, sources, is_member=True
+                )
+                member_info["name"] = name
+                info["members"].append(member_info)
+        info["sources"] = sources
+        return info
+
+    def find_module_path(self, module_name: str) -> typing.Optional[str]:
+        """
+        Find the source file for `module_name` on `sys.path`, without importing
+        any of its parent packages.
+        """
+        if module_name not in self.module_paths:
+            self.module_paths[module_name] = None
+            parts = module_name.split(".")
+            for entry in sys.path:
+                base = os.path.join(entry or os.getcwd(), *parts)
+                for path in (base + ".py", os.path.join(base, "__init__.py")):
+                    if os.path.isfile(path):
+                        self.module_paths[module_name] = path
+                        break
+                if self.module_paths[module_name] is not None:
+                    break
+        return self.module_paths[module_name]
+
+    def get_module(self, module_name: str) -> typing.Optional[ModuleSource]:
+        path = self.find_module_path(module_name) if module_name else None
+        if path is None:
+            return None
+        stat = os.stat(path)
+        key = (stat.st_mtime, stat.st_size)
+        cached = self.parsed.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with open(path, "rb") as source_file:
+            source = importlib.util.decode_source(source_file.read())
+        tree = ast.parse(source, filename=path)
+        module = ModuleSource(module_name, path, source, tree)
+        self.parsed[path] = (key, module)
+        return module
+
+    def resolve(
+        self, module_name: str, name: str, depth: int = 0
+    ) -> typing.Optional[typing.Tuple[ModuleSource, typing.Any]]:
+        """
+        Return the module that `name` is defined in, and the AST node that
+        defines it, following any imports. Modules are returned as the node
+        for themselves.
+        """
+        module = self.get_module(module_name)
+        if module is None or depth > MAX_IMPORT_DEPTH:
+            return None
+        target = module.names.get(name)
+        if target is None:
+            for star_module in module.star_imports:
+                resolved = self.resolve(star_module, name, depth + 1)
+                if resolved is not None:
+                    return resolved
+        if target is None or isinstance(target, tuple):
+            if target is None:
+                target_module, target_name = f"{module_name}.{name}", None
+            else:
+                target_module, target_name = target
+            if target_name is None:
+                submodule = self.get_module(target_module)
+                return None if submodule is None else (submodule, submodule)
+            resolved = self.resolve(target_module, target_name, depth + 1)
+            if resolved is None:
+                # Eg. `from package import submodule`
+                submodule = self.get_module(f"{target_module}.{target_name}")
+                return None if submodule is None else (submodule, submodule)
+            return resolved
+        return (module, target)
+
+    def resolve_expr(
+        self, module: ModuleSource, expr: ast.expr
+    ) -> typing.Optional[typing.Tuple[ModuleSource, typing.Any]]:
+        """
+        Resolve a name, or dotted name, such as a base class, within `module`.
+        """
+        if isinstance(expr, ast.Name):
+            return self.resolve(module.name, expr.id)
+        if isinstance(expr, ast.Attribute):
+            resolved = self.resolve_expr(module, expr.value)
+            if resolved is not None and isinstance(resolved[1], ModuleSource):
+                return self.resolve(resolved[1].name, expr.attr)
+        return None
+
+    def get_bases(
+        self, module: ModuleSource, node: ast.ClassDef
+    ) -> typing.List[typing.Tuple[ModuleSource, ast.ClassDef]]:
+        """
+        Return the base classes of a class, in method resolution order,
+        skipping any that can't be resolved.
+        """
+        bases = []  # type: typing.List[typing.Tuple[ModuleSource, ast.ClassDef]]
+        for base in node.bases:
+            resolved = self.resolve_expr(module, base)
+            if resolved is not None and isinstance(resolved[1], ast.ClassDef):
+                for item in [resolved] + self.get_bases(*resolved):
+                    if all(item[1] is not existing[1] for existing in bases):
+                        bases.append(item)
+        return bases
+
+    def get_members(
+        self, module: ModuleSource, node: typing.Any
+    ) -> typing.Iterator[typing.Tuple[str, typing.Tuple[ModuleSource, typing.Any]]]:
+        """
+        Yield `(name, (module, node))` for each member of a module or class,
+        including any inherited members.
+        """
+        if isinstance(node, ModuleSource):
+            for name, member in node.names.items():
+                if not isinstance(member, tuple):
+                    yield (name, (node, member))
+        elif isinstance(node, ast.ClassDef):
+            seen = set()
+            for class_module, class_node in [(module, node)] + self.get_bases(
+                module, node
+            ):
+                for name, member in self.get_class_body_names(class_node):
+                    if name not in seen:
+                        seen.add(name)
+                        yield (name, (class_module, member))
+
+    def get_class_body_names(
+        self, node: ast.ClassDef
+    ) -> typing.List[typing.Tuple[str, typing.Any]]:
+        names = {}  # type: typing.Dict[str, typing.Any]
+        for child in node.body:
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                # Property accessors are documented along with the property.
+                if child.name not in names or not self.is_property_accessor(child):
+                    names[child.name] = child
+            elif isinstance(child, ast.ClassDef):
+                names[child.name] = child
+            elif isinstance(child, ast.Assign):
+                for target in child.targets:
+                    if isinstance(target, ast.Name):
+                        names[target.id] = child
+            elif isinstance(child, ast.AnnAssign) and isinstance(
+                child.target, ast.Name
+            ):
+                names[child.target.id] = child
+        return list(names.items())
+
+    def is_property_accessor(
+        self, node: typing.Union[ast.FunctionDef, ast.AsyncFunctionDef]
+    ) -> bool:
+        return any(
+            isinstance(decorator, ast.Attribute)
+            and decorator.attr in PROPERTY_ACCESSORS
+            and isinstance(decorator.value, ast.Name)
+            and decorator.value.id == node.name
+            for decorator in node.decorator_list
+        )
+
+    def get_item_info(
+        self,
+        module: ModuleSource,
+        node: typing.Any,
+        sources: typing.List[str],
+        is_member: bool = False,
+    ) -> typing.Dict[str, typing.Any]:
+        """
+        Return the same information as `autodoc.get_item_info`, for an AST node.
+        Any base class modules that the information depends on are added
+        to `sources`.
+        """
+        if isinstance(node, ModuleSource):
+            docstring = ast.get_docstring(node.tree, clean=False)
+            return {
+                "is_class": False,
+                "params": None,
+                "docstring": trim_docstring(docstring),
+            }
+
+        if isinstance(node, ast.ClassDef):
+            params = []  # type: typing.Optional[typing.List[str]]
+            for class_module, class_node in [(module, node)] + self.get_bases(
+                module, node
+            ):
+                if class_module.path not in sources:
+                    sources.append(class_module.path)
+                names = dict(self.get_class_body_names(class_node))
+                init = names.get("__init__")
+                if isinstance(init, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    params = self.get_params(class_module, init, skip_first=True)
+                    break
+            docstring = ast.get_docstring(node, clean=False)
+            return {
+                "is_class": True,
+                "params": params,
+                "docstring": trim_docstring(docstring),
+            }
+
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            decorators = {
+                (
+                    decorator.id
+                    if isinstance(decorator, ast.Name)
+                    else getattr(decorator, "attr", "")
+                )
+                for decorator in node.decorator_list
+            }
+            docstring = trim_docstring(ast.get_docstring(node, clean=False))
+            if is_member and (
+                decorators & {"property", "cached_property"}
+                or self.is_property_accessor(node)
+            ):
+                params = None
+            else:
+                skip_first = is_member and "classmethod" in decorators
+                params = self.get_params(module, node, skip_first=skip_first)
+            return {"is_class": False, "params": params, "docstring": docstring}
+
+        # Assignments, such as constants.
+        return {"is_class": False, "params": None, "docstring": ""}
+
+    def get_params(
+        self,
+        module: ModuleSource,
+        node: typing.Union[ast.FunctionDef, ast.AsyncFunctionDef],
+        skip_first: bool,
+    ) -> typing.List[str]:
+        """
+        Build an `inspect.Signature` from a function definition, so that the
+        parameters are rendered exactly as they are for imported functions.
+        """
+        args = node.args
+        parameters = []
+        positional = list(args.posonlyargs) + list(args.args)
+        num_positional_only = len(positional) - len(args.args)
+        defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+        for idx, (arg, default) in enumerate(zip(positional, defaults)):
+            kind = (
+                inspect.Parameter.POSITIONAL_ONLY
+                if idx < num_positional_only
+                else inspect.Parameter.POSITIONAL_OR_KEYWORD
+            )
+            parameters.append(self.make_parameter(module, arg.arg, kind, default))
+        if args.vararg is not None:
+            parameters.append(
+                self.make_parameter(
+                    module, args.vararg.arg, inspect.Parameter.VAR_POSITIONAL, None
+                )
+            )
+        for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+            parameters.append(
+                self.make_parameter(
+                    module, arg.arg, inspect.Parameter.KEYWORD_ONLY, default
+                )
+            )
+        if args.kwarg is not None:
+            parameters.append(
+                self.make_parameter(
+                    module, args.kwarg.arg, inspect.Parameter.VAR_KEYWORD, None
+                )
+            )
+
+        if (
+            skip_first
+            and parameters
+            and parameters[0].kind
+            in (
+                inspect.Parameter.POSITIONAL_ONLY,
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            )
+        ):
+            parameters = parameters[1:]
+        return get_params(inspect.Signature(parameters))
+
+    def make_parameter(
+        self,
+        module: ModuleSource,
+        name: str,
+        kind: typing.Any,
+        default: typing.Optional[ast.expr],
+    ) -> inspect.Parameter:
+        if default is None:
+            return inspect.Parameter(name, kind)
+        try:
+            value = self.evaluate(module, default)  # type: typing.Any
+        except Exception:
+            # Any error evaluating the default, such as a division by zero,
+            # just means that it's shown as its source instead.
+            source = ast.get_source_segment(module.source, default)
+            value = SourceDefault(source or "...")
+        return inspect.Parameter(name, kind, default=value)
+
+    def evaluate(
+        self, module: ModuleSource, expr: ast.expr, depth: int = 0
+    ) -> typing.Any:
+        """
+        Evaluate a constant expression, such as `64 * 1024`, which may refer
+        to module level constants. Raises `ValueError` if the expression
+        isn't constant.
+        """
+        if depth > MAX_IMPORT_DEPTH or not all(
+            isinstance(node, CONSTANT_NODES) for node in ast.walk(expr)
+        ):
+            raise ValueError("Not a constant expression.")
+        namespace = {}  # type: typing.Dict[str, typing.Any]
+        for node in ast.walk(expr):
+            if isinstance(node, ast.Name) and node.id not in namespace:
+                resolved = self.resolve(module.name, node.id)
+                if resolved is None or not isinstance(
+                    resolved[1], (ast.Assign, ast.AnnAssign)
+                ):
+                    raise ValueError(f"{node.id!r} is not a constant.")
+                value_module, assignment = resolved
+                if assignment.value is None:
+                    raise ValueError(f"{node.id!r} has no value.")
+                namespace[node.id] = self.evaluate(
+                    value_module, assignment.value, depth + 1
+                )
+        code = compile(ast.Expression(body=expr), module.path, "eval")
+        return eval(code, {"__builtins__": {}}, namespace)
@@ -0,0 +1,218 @@
+from markdown import Markdown
+from markdown.extensions.attr_list import get_attrs
+from markdown.extensions.codehilite import (
+    CodeHilite,
+    CodeHiliteExtension,
+    HiliteTreeprocessor,
+    parse_hl_lines,
+)
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+from mkdocs2.cache import DiskCache, PicklableLock
+from pygments.lexer import Lexer
+from pygments.lexers import get_lexer_by_name, guess_lexer
+from pygments.formatters import get_formatter_by_name
+from pygments.util import ClassNotFound
+import hashlib
+import json
+import pygments
+import threading
+import typing
+
+
+class Highlighter(PicklableLock):
+    """
+    Highlights code with Pygments, memoizing the HTML in memory and in `cache_dir`.
+    """
+
+    def __init__(self, cache_dir: str = None) -> None:
+        self.cache_dir = cache_dir
+        self.disk_cache = (
+            None if cache_dir is None else DiskCache(cache_dir, "highlight")
+        )
+        self.entries = {}  # type: typing.Dict[str, str]
+        self.lexers = {}  # type: typing.Dict[str, typing.Optional[Lexer]]
+        self.lock = threading.Lock()
+
+    def highlight(
+        self, src: str, lang: typing.Optional[str], guess_lang: bool, options: dict
+    ) -> str:
+        """
+        Return `src` highlighted as HTML.
+
+        If `lang` is `None` or unknown, then the language is guessed from the
+        code if `guess_lang` is set, or else the code is left as plain text.
+        """
+        key = json.dumps(
+            [pygments.__version__, src, lang, guess_lang, options],
+            sort_keys=True,
+            default=str,
+        )
+        key = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        with self.lock:
+            html = self.entries.get(key)
+        if html is None and self.disk_cache is not None:
+            html = self.disk_cache.get(key)
+        if html is not None:
+            return html
+
+        lexer = None if lang is None else self.get_lexer(lang, options)
+        if lexer is None and guess_lang:
+            try:
+                lexer = guess_lexer(src, **options)
+            except ClassNotFound:  # pragma: nocover
+                pass
+        if lexer is None:
+            lexer = self.get_lexer("text", options)
+        formatter = get_formatter_by_name("html", **options)
+        html = pygments.highlight(src, lexer, formatter)
+
+        with self.lock:
+            self.entries[key] = html
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, html)
+        return html
+
+    def get_lexer(self, lang: str, options: dict) -> typing.Optional[Lexer]:
+        """
+        Return the lexer for `lang`, or `None` if there isn't one.
+        """
+        key = json.dumps([lang, options], sort_keys=True, default=str)
+        with self.lock:
+            if key in self.lexers:
+                return self.lexers[key]
+        try:
+            lexer = get_lexer_by_name(lang, **options)  # type: typing.Optional[Lexer]
+        except ClassNotFound:
+            lexer = None
+        with self.lock:
+            self.lexers[key] = lexer
+        return lexer
+
+
+class CachedCodeHilite(CodeHilite):
+    """
+    A `CodeHilite` that highlights code using a shared `Highlighter`.
+    """
+
+    def __init__(
+        self,
+        src: str,
+        highlighter: Highlighter,
+        default_lang: str = None,
+        **options: typing.Any,
+    ) -> None:
+        super().__init__(src, **options)
+        self.src = src  # type: str
+        self.highlighter = highlighter
+        self.default_lang = default_lang
+
+    def hilite(self, shebang: bool = True) -> str:
+        self.src = self.src.strip("\n")
+        if self.lang is None and shebang:
+            self._parseHeader()
+        lang = self.lang or self.default_lang
+        return self.highlighter.highlight(self.src, lang, self.guess_lang, self.options)
+
+
+class HighlightTreeprocessor(HiliteTreeprocessor):
+    """
+    Highlights indented code blocks.
+    """
+
+    def run(self, root: typing.Any) -> None:
+        for block in root.iter("pre"):
+            if len(block) == 1 and block[0].tag == "code":
+                local_config = self.config.copy()
+                code = CachedCodeHilite(
+                    self.code_unescape(block[0].text),
+                    highlighter=self.md.highlighter,
+                    tab_length=self.md.tab_length,
+                    style=local_config.pop("pygments_style", "default"),
+                    **local_config,
+                )
+                placeholder = self.md.htmlStash.store(code.hilite())
+                # Replace the block with the placeholder for the highlighted code.
+                block.clear()
+                block.tag = "p"
+                block.text = placeholder
+
+
+class HighlightFencedBlockPreprocessor(FencedBlockPreprocessor):
+    """
+    Highlights fenced code blocks.
+
+    Unlike the `fenced_code` extension, code is always highlighted, so
+    `use_pygments` may not be set on individual blocks.
+    """
+
+    def __init__(self, md: Markdown, config: dict) -> None:
+        super().__init__(md, {})
+        self.highlight_config = config
+
+    def run(self, lines: typing.List[str]) -> typing.List[str]:
+        text = "\n".join(lines)
+        while True:
+            match = self.FENCED_BLOCK_RE.search(text)
+            if match is None:
+                break
+
+            lang = None  # type: typing.Optional[str]
+            classes = []  # type: typing.List[str]
+            config = {}  # type: typing.Dict[str, typing.Any]
+            if match.group("attrs"):
+                _, classes, config = self.handle_attrs(get_attrs(match.group("attrs")))
+                if classes:
+                    lang = classes.pop(0)
+            else:
+                lang = match.group("lang") or None
+                if match.group("hl_lines"):
+                    config["hl_lines"] = parse_hl_lines(match.group("hl_lines"))
+
+            local_config = dict(self.highlight_config, **config)
+            if classes:
+                # Pygments may append a suffix to the last class, so the
+                # `css_class` must come last.
+                css_class = local_config["css_class"]
+                local_config["css_class"] = " ".join(classes + [css_class])
+            code = CachedCodeHilite(
+                match.group("code"),
+                highlighter=self.md.highlighter,
+                lang=lang,
+                style=local_config.pop("pygments_style", "default"),
+                **local_config,
+            )
+            placeholder = self.md.htmlStash.store(code.hilite(shebang=False))
+            text = f"{text[:match.start()]}\n{placeholder}\n{text[match.end():]}"
+        return text.split("\n")
+
+
+class Highlight(CodeHiliteExtension):
+    """
+    Highlights both fenced and indented code blocks, in place of the
+    `fenced_code` and `codehilite` extensions, with the same options and
+    output as using those together.
+
+    Pass a `highlighter` to share its results with other instances.
+
+    Additional options:
+
+    * `default_lang` - The language of any code blocks that don't specify
+    one. With `guess_lang=False` as well, the language is never guessed.
+    """
+
+    def __init__(self, highlighter: Highlighter = None, **kwargs: typing.Any) -> None:
+        self.highlighter = Highlighter() if highlighter is None else highlighter
+        super().__init__(**kwargs)
+        if "default_lang" not in kwargs:
+            self.config["default_lang"] = [None, "The default language"]
+
+    def extendMarkdown(self, md: Markdown) -> None:
+        md.highlighter = self.highlighter
+        md.registerExtension(self)
+
+        config = self.getConfigs()
+        fenced = HighlightFencedBlockPreprocessor(md, config)
+        md.preprocessors.register(fenced, "fenced_code_block", 25)
+        hiliter = HighlightTreeprocessor(md)
+        hiliter.config = config
+        md.treeprocessors.register(hiliter, "hilite", 30)
@@ -2,24 +2,65 @@ from markdown import Markdown
 from markdown.extensions import Extension
 from markdown.treeprocessors import Treeprocessor
 from markdown.util import etree
+import typing
 
 
 class SearchIndexProcessor(Treeprocessor):
+    headings = {"h1", "h2", "h3", "h4", "h5"}
+
     def run(self, root: etree.ElementTree) -> etree.ElementTree:
-        search_index = []
+        # A list of `(ref, title, text_parts)` for each section. The text is
+        # gathered into a list, and only joined once the document is done.
+        sections = []  # type: typing.List[typing.Tuple[str, str, typing.List[str]]]
+
+        # Elements within headings, which are included in the title instead.
+        skip = set()  # type: typing.Set[etree.Element]
 
         for element in root.iter():
-            if element.tag in {"h1", "h2", "h3", "h4", "h5"} and element.get("id"):
-                search_index.append(
-                    {"ref": element.get("id"), "title": element.text, "text": ""}
-                )
-            elif search_index:
-                search_index[-1]["text"] += element.text + " "
+            if element in skip:
+                continue
+            if element.tag in self.headings and element.get("id"):
+                sections.append((element.get("id"), self.get_title(element), []))
+                skip.update(element.iter())
+            elif sections and element.text is not None:
+                if not self.is_permalink(element):
+                    sections[-1][2].append(element.text + " ")
+
+        self.md.search_index = [
+            {"ref": ref, "title": title, "text": "".join(text_parts)}
+            for ref, title, text_parts in sections
+        ]
 
-        self.md.search_index = search_index
+    def get_title(self, element: etree.Element) -> str:
+        """
+        Return the text of a heading, without any permalink.
+        """
+        parts = [element.text or ""]
+        for child in element:
+            if not self.is_permalink(child):
+                parts.append("".join(child.itertext()))
+            parts.append(child.tail or "")
+        return "".join(parts)
+
+    def is_permalink(self, element: etree.Element) -> bool:
+        return element.tag == "a" and element.get("class") == "headerlink"
 
 
 class SearchIndex(Extension):
+    """
+    A Markdown extension that sets `md.search_index` to a list of the sections
+    in the document, with the heading `ref` and `title`, and the `text` of
+    each section.
+    """
+
     def extendMarkdown(self, md: Markdown) -> None:
+        self.md = md
+        md.registerExtension(self)
         processor = SearchIndexProcessor(md)
         md.treeprocessors.register(processor, "search_index", 1)
+        self.reset()
+
+    def reset(self) -> None:
+        # Treeprocessors don't run for empty documents, so the index must be
+        # cleared here, rather than only being set by the processor.
+        self.md.search_index = []
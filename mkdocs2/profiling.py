@@ -0,0 +1,96 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import typing
+
+
+class Profiler:
+    """
+    Records timings for each phase of the build.
+
+    Events are recorded in the Chrome trace event format, so they may be
+    written out and loaded into tools such as `chrome://tracing` or Perfetto.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.events = []  # type: typing.List[typing.Dict[str, typing.Any]]
+
+    @contextlib.contextmanager
+    def measure(
+        self, name: str, category: str, **args: typing.Any
+    ) -> typing.Iterator[None]:
+        """
+        Record the time taken within the block, as a `category` event.
+
+        Eg. `with profiler.measure("topics/a.md", "convert", convertor="MarkdownPages"):`
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": start * 1000000,
+                    "dur": (end - start) * 1000000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+            )
+
+    def get_summary(self, slowest: int = 10) -> str:
+        """
+        Return a plain text report of where the build time was spent.
+
+        Includes a per-phase summary, a per-convertor summary, and the `slowest`
+        files to build. Note that `render_template` calls take place within
+        `convert`, so are included in the convert timings too.
+        """
+        phases = {}  # type: typing.Dict[str, typing.List[float]]
+        convertors = {}  # type: typing.Dict[typing.Tuple[str, str], typing.List[float]]
+        files = {}  # type: typing.Dict[str, float]
+
+        for event in self.events:
+            seconds = event["dur"] / 1000000
+            phases.setdefault(event["cat"], []).append(seconds)
+            convertor = event["args"].get("convertor")
+            if convertor is not None:
+                key = (convertor, event["cat"])
+                convertors.setdefault(key, []).append(seconds)
+                files[event["name"]] = files.get(event["name"], 0.0) + seconds
+
+        lines = [f"{'Phase':<30} {'Calls':>8} {'Total (s)':>10}"]
+        for phase, durations in phases.items():
+            lines.append(f"{phase:<30} {len(durations):>8} {sum(durations):>10.3f}")
+
+        lines.append("")
+        lines.append(f"{'Convertor':<30} {'Calls':>8} {'Total (s)':>10}")
+        for (convertor, phase), durations in sorted(convertors.items()):
+            name = f"{convertor}.{phase}"
+            lines.append(f"{name:<30} {len(durations):>8} {sum(durations):>10.3f}")
+
+        lines.append("")
+        lines.append(f"Slowest {slowest} files:")
+        ranked = sorted(files.items(), key=lambda item: item[1], reverse=True)
+        for name, seconds in ranked[:slowest]:
+            lines.append(f"{seconds:>10.3f}s  {name}")
+
+        return "\n".join(lines)
+
+    def write_trace(self, path: str) -> None:
+        """
+        Write the recorded events to a JSON file, in the Chrome trace format.
+        """
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": self.events}, trace_file)
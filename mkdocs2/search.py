@@ -0,0 +1,142 @@
+import base64
+import re
+import typing
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Suffixes removed by `stem`, longest first. This is a deliberately simple
+# stemmer, so that it's easy for a client to apply exactly the same rules
+# to search queries.
+SUFFIXES = (
+    "ational",
+    "ization",
+    "fulness",
+    "iveness",
+    "ations",
+    "ation",
+    "ments",
+    "ment",
+    "ness",
+    "ings",
+    "ing",
+    "edly",
+    "ies",
+    "ied",
+    "ed",
+    "es",
+    "ly",
+    "s",
+)
+
+
+# The shortest stem that `stem` will leave.
+MIN_STEM_LENGTH = 3
+
+# The keys of the shards that terms are split into. See `get_shard_key`.
+SHARD_KEYS = "0123456789abcdefghijklmnopqrstuvwxyz_"
+
+
+def stem(word: str) -> str:
+    """
+    Strip any common suffix from a lowercase word.
+
+    Eg. `stem("building") == "build"`, `stem("builds") == "build"`
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> typing.List[str]:
+    """
+    Split text into a list of stemmed, lowercase terms.
+    """
+    return [stem(token) for token in TOKEN_RE.findall(text.lower())]
+
+
+def encode_postings(postings: typing.List[typing.Tuple[int, int]]) -> str:
+    """
+    Compress a sorted list of `(document_id, term_frequency)` pairs.
+
+    Document ids are stored as the difference from the previous id, and each
+    number is written as a variable length integer, seven bits per byte,
+    with the high bit set on all but the last byte. The bytes are then
+    base64 encoded, so that they can be included in JSON.
+    """
+    data = bytearray()
+    previous = 0
+    for document_id, frequency in postings:
+        for number in (document_id - previous, frequency):
+            while number >= 0x80:
+                data.append((number & 0x7F) | 0x80)
+                number >>= 7
+            data.append(number)
+        previous = document_id
+    return base64.b64encode(bytes(data)).decode("ascii")
+
+
+def decode_postings(encoded: str) -> typing.List[typing.Tuple[int, int]]:
+    """
+    Decompress a list of postings, written by `encode_postings`.
+    """
+    numbers = []
+    number = shift = 0
+    for byte in base64.b64decode(encoded):
+        number |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number = shift = 0
+
+    postings = []
+    document_id = 0
+    for idx in range(0, len(numbers), 2):
+        document_id += numbers[idx]
+        postings.append((document_id, numbers[idx + 1]))
+    return postings
+
+
+def get_term_frequencies(doc: typing.Dict[str, str]) -> typing.Dict[str, int]:
+    """
+    Return the number of occurrences of each term in a search document,
+    including the terms in its title.
+    """
+    frequencies = {}  # type: typing.Dict[str, int]
+    for term in tokenize(doc["title"] + " " + doc["text"]):
+        frequencies[term] = frequencies.get(term, 0) + 1
+    return frequencies
+
+
+def get_shard_key(term: str) -> str:
+    """
+    Return the key of the index shard that a term belongs in. Terms are
+    sharded by their first character, with `"_"` for anything outside of
+    `a-z` and `0-9`.
+    """
+    return term[0] if term[0] in SHARD_KEYS else "_"
+
+
+def build_inverted_index(
+    docs: typing.List[typing.Dict[str, str]],
+) -> typing.Dict[str, typing.Any]:
+    """
+    Return an inverted index for a list of search documents, mapping each
+    term to its compressed postings. Document ids are indexes into `docs`.
+
+    Terms from the title and the text are both included.
+    """
+    postings = {}  # type: typing.Dict[str, typing.List[typing.Tuple[int, int]]]
+    for document_id, doc in enumerate(docs):
+        for term, frequency in get_term_frequencies(doc).items():
+            postings.setdefault(term, []).append((document_id, frequency))
+
+    return {
+        "suffixes": list(SUFFIXES),
+        "min_stem_length": MIN_STEM_LENGTH,
+        "terms": {
+            term: encode_postings(term_postings)
+            for term, term_postings in sorted(postings.items())
+        },
+    }
@@ -0,0 +1,474 @@
+from http import HTTPStatus
+from mkdocs2.core import build_file, load_env
+from mkdocs2.manifest import get_stat_info, is_unchanged
+from mkdocs2.types import File, MemoryOutput
+from urllib.parse import urlparse, parse_qs
+import collections
+import email.utils
+import gzip
+import http.server
+import io
+import os
+import threading
+import time
+import typing
+
+try:
+    import brotli
+except ImportError:  # pragma: nocover
+    brotli = None
+
+
+LIVERELOAD_PATH = "/livereload"
+
+LIVERELOAD_SCRIPT = """<script>
+(function () {
+  var source = new EventSource("%s?version=%d");
+  source.onmessage = function () { window.location.reload(); };
+})();
+</script>"""
+
+
+class BuildVersion:
+    """
+    A counter that is incremented after every rebuild, which clients may wait on.
+    """
+
+    def __init__(self) -> None:
+        self.value = 0
+        self.condition = threading.Condition()
+
+    def increment(self) -> None:
+        with self.condition:
+            self.value += 1
+            self.condition.notify_all()
+
+    def wait_for_change(self, value: int, timeout: float = None) -> bool:
+        """
+        Block until the version is greater than `value`, returning `False` if
+        the timeout expires first.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.value > value, timeout)
+
+
+class Watcher:
+    """
+    Polls a set of files and directories for any changes.
+
+    Uses modification times and sizes, so there are no dependencies on any
+    platform specific file system notifications.
+    """
+
+    def __init__(self, paths: typing.List[str]) -> None:
+        self.paths = paths
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self) -> typing.Dict[str, typing.Tuple[float, int]]:
+        snapshot = {}
+        for path in self.paths:
+            if os.path.isdir(path):
+                for dirpath, dirnames, filenames in os.walk(path):
+                    for filename in filenames:
+                        file_path = os.path.join(dirpath, filename)
+                        snapshot[file_path] = self.get_stat(file_path)
+            elif os.path.exists(path):
+                snapshot[path] = self.get_stat(path)
+        return snapshot
+
+    def get_stat(self, path: str) -> typing.Tuple[float, int]:
+        try:
+            stat = os.stat(path)
+        except OSError:  # pragma: nocover
+            # The file was removed while we were walking the directory.
+            return (0.0, -1)
+        return (stat.st_mtime, stat.st_size)
+
+    def get_changes(self) -> typing.Set[str]:
+        """
+        Return the set of any paths that have been added, removed, or modified
+        since the last call.
+        """
+        previous, self.snapshot = self.snapshot, self.take_snapshot()
+        return {
+            path
+            for path in set(previous) | set(self.snapshot)
+            if previous.get(path) != self.snapshot.get(path)
+        }
+
+
+def inject_livereload_script(html: bytes, version: int) -> bytes:
+    """
+    Insert the livereload script into an HTML page, just before `</body>`.
+    """
+    script = (LIVERELOAD_SCRIPT % (LIVERELOAD_PATH, version)).encode("utf-8")
+    idx = html.rfind(b"</body>")
+    if idx == -1:
+        return html + script
+    return html[:idx] + script + html[idx:]
+
+
+class LazySite:
+    """
+    Builds the documentation into memory, building each file on demand the
+    first time that it is requested.
+
+    Built files are cached until any of their inputs change. Startup only
+    needs to gather the files and load the navigation, so the time to serve
+    the first page doesn't depend on the size of the site.
+    """
+
+    def __init__(self, config: typing.Dict) -> None:
+        self.config = config
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        """
+        Load the site information, discarding any files that have been built.
+        """
+        output = MemoryOutput()
+        env = load_env(self.config, output=output)
+        # The inputs of any fingerprinted files, as of when their output paths
+        # were determined. If these change then the site must be reloaded.
+        fingerprinted_inputs = {
+            file.full_input_path: get_stat_info(file.full_input_path)
+            for file in env.files
+            if file.aliases
+        }
+        with self.lock:
+            self.output = output
+            self.env = env
+            self.fingerprinted_inputs = fingerprinted_inputs
+            # A lookup of `output_path` -> information on the inputs it was
+            # built from, so that we can tell when it needs rebuilding.
+            self.built_inputs = {}  # type: typing.Dict[str, dict]
+
+    def get(self, url_path: str) -> typing.Optional[typing.Tuple[bytes, float, str]]:
+        """
+        Return the content, build time, and output path, of the file
+        at `url_path`, building it if required.
+        """
+        if url_path.endswith("/index.html"):
+            url_path = url_path[: -len("index.html")]
+
+        with self.lock:
+            try:
+                file = self.env.files.get_by_url_path(url_path)
+            except KeyError:
+                # Some convertors write additional outputs alongside a file,
+                # such as the shards of a search index. These are served
+                # once they've been written.
+                output_path = url_path.lstrip("/")
+                if not self.output.exists(output_path):
+                    return None
+                content, mtime = self.output.read_bytes(output_path)
+                return (content, mtime, output_path)
+            if not self.is_fresh(file):
+                self.discard_stale_search_entries()
+                build_file(file, self.env)
+                input_paths = [file.full_input_path] if file.input_path else []
+                self.built_inputs[file.output_path] = {
+                    path: get_stat_info(path)
+                    for path in input_paths + file.dependencies
+                }
+            content, mtime = self.output.read_bytes(file.output_path)
+            return (content, mtime, file.output_path)
+
+    def discard_stale_search_entries(self) -> None:
+        """
+        Discard the search entries of any pages that have changed since they
+        were built, so that a search index built from them parses the pages
+        again, rather than using the entries from the earlier build.
+        """
+        for file in self.env.files:
+            if file.search_index is not None and not self.is_fresh(file):
+                file.search_index = None
+
+    def is_fingerprinted(self, url_path: str) -> bool:
+        """
+        Return `True` if `url_path` is the fingerprinted URL of an asset,
+        which never changes, and so may be cached indefinitely.
+
+        If the asset has changed since its fingerprint was taken, then the
+        content no longer matches the URL until the site is reloaded.
+        """
+        with self.lock:
+            try:
+                file = self.env.files.get_by_url_path(url_path)
+            except KeyError:
+                return False
+            if not file.aliases or url_path in file.aliases:
+                return False
+            path = file.full_input_path
+            return is_unchanged(path, self.fingerprinted_inputs[path])
+
+    def is_fresh(self, file: File) -> bool:
+        """
+        Return `True` if `file` has been built, and its inputs are unchanged.
+        """
+        inputs = self.built_inputs.get(file.output_path)
+        if inputs is None or not self.output.exists(file.output_path):
+            return False
+        return all(is_unchanged(path, info) for path, info in inputs.items())
+
+    def requires_reload(self, changed_paths: typing.Set[str]) -> bool:
+        """
+        Return `True` if the given changes require the site to be reloaded.
+
+        Modifying an existing input file, or a dependency such as an autodoc
+        module, only requires rebuilding the files built from it, which
+        happens when they are next requested. Anything else, such as adding
+        or removing files, changing the templates, or changing a fingerprinted
+        asset, and so its URL, affects every page.
+        """
+        with self.lock:
+            if self.fingerprinted_inputs.keys() & changed_paths:
+                return True
+            known_paths = {
+                path for inputs in self.built_inputs.values() for path in inputs
+            }
+            known_paths |= {
+                file.full_input_path for file in self.env.files if file.input_path
+            }
+        return any(
+            path not in known_paths or not os.path.exists(path)
+            for path in changed_paths
+        )
+
+
+class DocsServer(http.server.ThreadingHTTPServer):
+    """
+    A threaded HTTP server, which keeps track of its request rate for logging.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, *args: typing.Any, **kwargs: typing.Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.request_times = collections.deque()  # type: typing.Deque[float]
+        self.request_times_lock = threading.Lock()
+
+    def record_request(self) -> float:
+        """
+        Record a completed request, returning the number of requests
+        handled over the last second.
+        """
+        now = time.monotonic()
+        with self.request_times_lock:
+            self.request_times.append(now)
+            while self.request_times[0] < now - 1.0:
+                self.request_times.popleft()
+            return float(len(self.request_times))
+
+
+class RequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves the built documentation.
+
+    Supports keep-alive connections, conditional requests using `ETag` and
+    `Last-Modified`, and compression of text responses.
+
+    Files are built on demand by the `site`, and served from memory.
+
+    If a `build_version` is provided then HTML pages include a script that
+    reloads the page whenever the documentation is rebuilt.
+    """
+
+    protocol_version = "HTTP/1.1"
+    compressible_types = {
+        "text/html",
+        "text/css",
+        "text/plain",
+        "application/javascript",
+        "text/javascript",
+        "application/json",
+        "image/svg+xml",
+    }
+
+    def __init__(
+        self,
+        *args: typing.Any,
+        site: LazySite,
+        build_version: BuildVersion = None,
+        **kwargs: typing.Any,
+    ) -> None:
+        # Must be set before calling `__init__`, which handles the request.
+        self.site = site
+        self.build_version = build_version
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self) -> None:
+        path = urlparse(self.path).path
+        if self.build_version is not None and path == LIVERELOAD_PATH:
+            self.send_reload_event()
+            return
+        super().do_GET()
+
+    def send_head(self) -> typing.Optional[typing.BinaryIO]:
+        path = urlparse(self.path).path
+        try:
+            built = self.site.get(path)
+        except Exception as exc:
+            # Report any errors building the file, rather than dropping
+            # the connection.
+            self.log_error("Error building %r: %r", path, exc)
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"Build failed: {exc!r}")
+            return None
+        if built is None:
+            if not path.endswith("/") and self.site.get(path + "/") is not None:
+                self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+                self.send_header("Location", path + "/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        content, mtime, output_path = built
+        content_type = self.guess_type(output_path)
+        return self.send_file(
+            io.BytesIO(content),
+            len(content),
+            mtime,
+            content_type,
+            immutable=self.site.is_fingerprinted(path),
+        )
+
+    def send_file(
+        self,
+        input_file: typing.BinaryIO,
+        size: int,
+        mtime: float,
+        content_type: str,
+        immutable: bool = False,
+    ) -> typing.Optional[typing.BinaryIO]:
+        """
+        Send the response headers for a file, returning the body to send, if any.
+
+        If `immutable` is set then the file may be cached indefinitely.
+        """
+        # The version of the build that any livereload script should reference.
+        version = None  # type: typing.Optional[int]
+        if self.build_version is not None and content_type == "text/html":
+            version = self.build_version.value
+
+        etag = f"{int(mtime * 1000000):x}-{size:x}"
+        if version is not None:
+            etag += f"-{version:x}"
+        etag = f'"{etag}"'
+
+        if self.is_not_modified(etag, mtime):
+            input_file.close()
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return None
+
+        encoding = self.get_content_encoding(content_type)
+        if version is None and encoding is None:
+            # Stream the file as it is.
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(size))
+            self.send_cache_headers(etag, mtime, content_type, immutable)
+            self.end_headers()
+            return input_file
+
+        with input_file:
+            content = input_file.read()
+        if version is not None:
+            content = inject_livereload_script(content, version)
+        if encoding is not None:
+            content = compress(content, encoding)
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+        self.send_cache_headers(etag, mtime, content_type, immutable)
+        self.end_headers()
+        return io.BytesIO(content)
+
+    def send_cache_headers(
+        self, etag: str, mtime: float, content_type: str, immutable: bool = False
+    ) -> None:
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.date_time_string(int(mtime)))
+        if immutable:
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        else:
+            self.send_header("Cache-Control", "no-cache")
+        if content_type in self.compressible_types:
+            self.send_header("Vary", "Accept-Encoding")
+
+    def is_not_modified(self, etag: str, mtime: float) -> bool:
+        """
+        Return `True` if the client's cached copy of the response is up to date.
+        """
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            etags = [value.strip() for value in if_none_match.split(",")]
+            return etag in etags or "*" in etags
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since.timestamp()
+
+        return False
+
+    def get_content_encoding(self, content_type: str) -> typing.Optional[str]:
+        """
+        Determine which compression to use for the response, if any.
+        """
+        if content_type not in self.compressible_types:
+            return None
+        accept_encoding = self.headers.get("Accept-Encoding", "")
+        accepted = {value.split(";")[0].strip() for value in accept_encoding.split(",")}
+        if brotli is not None and "br" in accepted:  # pragma: nocover
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def send_reload_event(self) -> None:
+        """
+        Respond with a server-sent event once the documentation is rebuilt.
+
+        If no rebuild happens within the timeout, then we close the connection,
+        and the browser will reconnect.
+        """
+        assert self.build_version is not None
+        query = parse_qs(urlparse(self.path).query)
+        version = int(query.get("version", ["0"])[0])
+        changed = self.build_version.wait_for_change(version, timeout=30.0)
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        self.wfile.write(b"retry: 250\n")
+        if changed:
+            self.wfile.write(b"data: reload\n\n")
+
+    def log_request(self, code: typing.Any = "-", size: typing.Any = "-") -> None:
+        if isinstance(code, HTTPStatus):
+            code = code.value
+        server = self.server
+        rate = server.record_request() if isinstance(server, DocsServer) else 0.0
+        self.log_message(
+            '"%s" %s %s (%.0f req/s)', self.requestline, str(code), str(size), rate
+        )
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":  # pragma: nocover
+        return brotli.compress(content)
+    return gzip.compress(content, compresslevel=6)
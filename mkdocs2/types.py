@@ -1,6 +1,14 @@
+from mkdocs2.file_copy import copy_file, is_same_file
+from mkdocs2.profiling import Profiler
+import contextlib
+import fnmatch
+import functools
+import hashlib
+import io
 import jinja2
 import os
-import posixpath
+import tempfile
+import time
 import typing
 from urllib.parse import urlparse, urlunparse, urljoin
 
@@ -8,10 +16,26 @@ from urllib.parse import urlparse, urlunparse, urljoin
 class Convertor:
     """
     Responsible for converting the source input file to the built output file.
+
+    Subclasses may either list the glob `patterns` of the input files that
+    they handle, or override `should_handle_file`. Patterns are compiled
+    together with those of the other convertors, so that each input file is
+    dispatched to its convertor with a single match.
+
+    Once each file is gathered, `prepare_file` is called with it, which
+    subclasses may override to adjust the file before any are built.
+
+    Convertors that read the `search_index` of other files should set
+    `uses_search_index`, so that pages are only indexed when it's needed.
     """
 
+    patterns = None  # type: typing.Optional[typing.List[str]]
+    uses_search_index = False
+
     def should_handle_file(self, input_path: str) -> bool:
-        raise NotImplementedError()  # pragma: no cover
+        if self.patterns is None:
+            raise NotImplementedError()  # pragma: no cover
+        return any(fnmatch.fnmatch(input_path, pattern) for pattern in self.patterns)
 
     def get_output_path(self, input_path: str) -> str:
         raise NotImplementedError()  # pragma: no cover
@@ -19,6 +43,12 @@ class Convertor:
     def get_extra_paths(self) -> typing.List[str]:
         raise NotImplementedError()  # pragma: no cover
 
+    def prepare_file(self, file: "File") -> None:
+        """
+        Called for each file handled by the convertor, including any extra
+        files, when the files are gathered. Eg. to change its `output_path`.
+        """
+
     def build_toc(self, file: "File", env: "Env") -> typing.Optional["TableOfContents"]:
         raise NotImplementedError()  # pragma: no cover
 
@@ -26,6 +56,158 @@ class Convertor:
         raise NotImplementedError()  # pragma: no cover
 
 
+class Output:
+    """
+    The destination that built files are written to.
+
+    Paths are the `output_path` of each file, relative to the output directory.
+    """
+
+    def write_text(self, output_path: str, text: str) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+    def open_text(self, output_path: str) -> typing.ContextManager[typing.TextIO]:
+        """
+        Open an output for writing incrementally, rather than all at once.
+        """
+        raise NotImplementedError()  # pragma: no cover
+
+    def copy_file(
+        self,
+        full_input_path: str,
+        output_path: str,
+        compare: str = "none",
+        method: str = "copy",
+    ) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+    def exists(self, output_path: str) -> bool:
+        raise NotImplementedError()  # pragma: no cover
+
+    def remove(self, output_path: str) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+
+class DiskOutput(Output):
+    """
+    Writes built files into an output directory.
+    """
+
+    def __init__(self, output_dir: str) -> None:
+        self.output_dir = output_dir
+        # The mode that `open()` creates files with, given the current umask.
+        # The umask can only be read by setting it, so this is done up front,
+        # rather than while outputs may be written from other threads.
+        umask = os.umask(0)
+        os.umask(umask)
+        self.file_mode = 0o666 & ~umask
+
+    def get_full_path(self, output_path: str) -> str:
+        """
+        Return the full path for the output, creating any parent directories.
+        """
+        full_output_path = os.path.join(self.output_dir, output_path)
+        dirname = os.path.dirname(full_output_path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        return full_output_path
+
+    def write_text(self, output_path: str, text: str) -> None:
+        with open(self.get_full_path(output_path), "w") as output_file:
+            output_file.write(text)
+
+    @contextlib.contextmanager
+    def open_text(self, output_path: str) -> typing.Iterator[typing.TextIO]:
+        """
+        Open an output for writing. The output is written to a temporary
+        file, and only moved into place once complete, so a failure part way
+        through doesn't leave a truncated output behind.
+        """
+        full_output_path = self.get_full_path(output_path)
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(full_output_path), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as output_file:
+                yield output_file
+            # Temporary files are only readable by their owner.
+            os.chmod(temp_path, self.file_mode)
+            os.replace(temp_path, full_output_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def copy_file(
+        self,
+        full_input_path: str,
+        output_path: str,
+        compare: str = "none",
+        method: str = "copy",
+    ) -> None:
+        """
+        Copy an input file into the output directory.
+
+        * `compare` - How to determine if an existing output is unchanged,
+        in which case the copy is skipped. One of "none", "mtime", or "hash".
+        * `method` - One of "copy", "hardlink", or "reflink".
+        """
+        full_output_path = self.get_full_path(output_path)
+        if not is_same_file(full_input_path, full_output_path, compare):
+            copy_file(full_input_path, full_output_path, method)
+
+    def exists(self, output_path: str) -> bool:
+        return os.path.exists(os.path.join(self.output_dir, output_path))
+
+    def remove(self, output_path: str) -> None:
+        full_output_path = os.path.join(self.output_dir, output_path)
+        if os.path.exists(full_output_path):
+            os.remove(full_output_path)
+
+
+class MemoryOutput(Output):
+    """
+    Holds built files in memory, rather than writing them to disk.
+    """
+
+    def __init__(self) -> None:
+        # A lookup of `output_path` -> (content, modified time).
+        self.contents = {}  # type: typing.Dict[str, typing.Tuple[bytes, float]]
+
+    def write_bytes(self, output_path: str, content: bytes) -> None:
+        self.contents[output_path] = (content, time.time())
+
+    def write_text(self, output_path: str, text: str) -> None:
+        self.write_bytes(output_path, text.encode("utf-8"))
+
+    @contextlib.contextmanager
+    def open_text(self, output_path: str) -> typing.Iterator[typing.TextIO]:
+        output_file = io.StringIO()
+        yield output_file
+        self.write_text(output_path, output_file.getvalue())
+
+    def copy_file(
+        self,
+        full_input_path: str,
+        output_path: str,
+        compare: str = "none",
+        method: str = "copy",
+    ) -> None:
+        with open(full_input_path, "rb") as input_file:
+            self.write_bytes(output_path, input_file.read())
+
+    def read_bytes(self, output_path: str) -> typing.Tuple[bytes, float]:
+        """
+        Return the content of a built file, and the time it was built.
+        """
+        return self.contents[output_path]
+
+    def exists(self, output_path: str) -> bool:
+        return output_path in self.contents
+
+    def remove(self, output_path: str) -> None:
+        self.contents.pop(output_path, None)
+
+
 class File:
     """
     A single file that needs to be built.
@@ -38,13 +220,28 @@ class File:
         input_dir: str,
         output_dir: str,
         convertor: Convertor,
+        output: Output = None,
     ) -> None:
         self.input_path = input_path
+        self._url = None  # type: typing.Optional[str]
         self.output_path = output_path
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.convertor = convertor
+        self.output = DiskOutput(output_dir) if output is None else output
         self.toc = None  # type: typing.Optional[TableOfContents]
+        # The converted content for the page, if the convertor produces it
+        # while building the table of contents, for use when rendering.
+        self.content = None  # type: typing.Optional[str]
+        # Any other source files that the output depends on, such as modules
+        # referenced by autodoc. Populated by the convertor during the build.
+        self.dependencies = []  # type: typing.List[str]
+        # The sections of the page, for including in a search index, if the
+        # convertor provides them. See `markdown_extensions.SearchIndex`.
+        self.search_index = None  # type: typing.Optional[typing.List[dict]]
+        # Any other URL paths that resolve to the file. Eg. the original path
+        # of an asset with a fingerprinted `output_path`.
+        self.aliases = []  # type: typing.List[str]
 
     def __eq__(self, other: typing.Any) -> bool:
         return (
@@ -57,14 +254,27 @@ class File:
     def __hash__(self) -> int:
         return hash(self.output_path)
 
+    @property
+    def output_path(self) -> str:
+        return self._output_path
+
+    @output_path.setter
+    def output_path(self, output_path: str) -> None:
+        self._output_path = output_path
+        self._url = None
+
     @property
     def url(self) -> str:
-        dirname, basename = os.path.split(self.output_path)
-        if basename == "index.html":
-            if not dirname:
-                return "/"
-            return "/" + dirname.replace(os.path.sep, "/") + "/"
-        return "/" + self.output_path.replace(os.path.sep, "/")
+        # Computed once, since it's needed for every link to the file.
+        if self._url is None:
+            dirname, basename = os.path.split(self.output_path)
+            if basename != "index.html":
+                self._url = "/" + self.output_path.replace(os.path.sep, "/")
+            elif dirname:
+                self._url = "/" + dirname.replace(os.path.sep, "/") + "/"
+            else:
+                self._url = "/"
+        return self._url
 
     @property
     def full_input_path(self) -> str:
@@ -79,57 +289,152 @@ class File:
             return input_file.read()
 
     def write_output_text(self, text: str) -> None:
-        with open(self.full_output_path, "w") as output_file:
-            output_file.write(text)
+        self.output.write_text(self.output_path, text)
+
+    def open_output_text(self) -> typing.ContextManager[typing.TextIO]:
+        return self.output.open_text(self.output_path)
+
+    def copy_input_to_output(self, compare: str = "none", method: str = "copy") -> None:
+        self.output.copy_file(
+            self.full_input_path, self.output_path, compare=compare, method=method
+        )
 
 
 class Files:
     """
     The collection of all the files that need to be built.
+
+    Files are kept in insertion order. Appending a file with the same input
+    path as an existing file replaces it, moving it to the end. Files provided
+    by convertors, that have no input path, are instead identified by their
+    output path. Appending, replacing and removing files are all O(1).
     """
 
-    def __init__(self, files: typing.List[File] = None) -> None:
-        self._files_list = []  # type: typing.List[File]
+    def __init__(self, files: typing.Iterable[File] = None) -> None:
+        self._files = {}  # type: typing.Dict[typing.Tuple[str, str], File]
+        self._files_list = None  # type: typing.Optional[typing.List[File]]
         self._files_by_input_path = {}  # type: typing.Dict[str, File]
+        self._files_by_output_path = {}  # type: typing.Dict[str, File]
         self._files_by_url_path = {}  # type: typing.Dict[str, File]
+        self._files_by_convertor = {}  # type: typing.Dict[Convertor, dict]
         if files is not None:
             for file in files:
                 self.append(file)
 
     def __iter__(self) -> typing.Iterator[File]:
-        return iter(self._files_list)
+        return iter(self._files.values())
 
     def __len__(self) -> int:
-        return len(self._files_list)
+        return len(self._files)
 
     def __eq__(self, other: typing.Any) -> bool:
-        return self._files_list == other._files_list
+        return list(self) == list(other)
 
     def __getitem__(self, index: int) -> File:
+        # The ordered list is only built when indexing, and is then kept
+        # until the collection changes.
+        if self._files_list is None:
+            self._files_list = list(self._files.values())
         return self._files_list[index]
 
+    def __contains__(self, file: File) -> bool:
+        return self._files.get(self.get_key(file)) is file
+
     def __add__(self, other: "Files") -> "Files":
-        return Files(self._files_list + other._files_list)
+        files = Files(self)
+        files += other
+        return files
 
     def __iadd__(self, other: "Files") -> "Files":
         for file in other:
             self.append(file)
         return self
 
+    def get_key(self, file: File) -> typing.Tuple[str, str]:
+        if file.input_path:
+            return (file.input_path, "")
+        return ("", file.output_path)
+
     def append(self, file: File) -> None:
-        existing = self._files_by_input_path.get(file.input_path)
+        key = self.get_key(file)
+        existing = self._files.get(key)
         if existing is not None:
-            self._files_list.remove(existing)
-        self._files_list.append(file)
-        self._files_by_input_path[file.input_path] = file
+            self.remove(existing)
+        self._files[key] = file
+        self._files_list = None
+        if file.input_path:
+            self._files_by_input_path[file.input_path] = file
+        self._files_by_output_path[file.output_path] = file
         self._files_by_url_path[file.url] = file
+        for alias in file.aliases:
+            self._files_by_url_path[alias] = file
+        self._files_by_convertor.setdefault(file.convertor, {})[key] = file
+
+    def remove(self, file: File) -> None:
+        key = self.get_key(file)
+        if self._files.get(key) is not file:
+            raise ValueError(f"File {file.output_path!r} is not in the collection.")
+        del self._files[key]
+        self._files_list = None
+        # Only remove index entries that refer to this file, since another
+        # file may have since been added with the same output path or URL.
+        for index, index_key in [
+            (self._files_by_input_path, file.input_path),
+            (self._files_by_output_path, file.output_path),
+            (self._files_by_url_path, file.url),
+        ] + [(self._files_by_url_path, alias) for alias in file.aliases]:
+            if index.get(index_key) is file:
+                del index[index_key]
+        del self._files_by_convertor[file.convertor][key]
 
     def get_by_input_path(self, path: str) -> File:
         return self._files_by_input_path[path]
 
+    def get_by_output_path(self, path: str) -> File:
+        return self._files_by_output_path[path]
+
     def get_by_url_path(self, path: str) -> File:
         return self._files_by_url_path[path]
 
+    def get_by_convertor(self, convertor: Convertor) -> typing.List[File]:
+        return list(self._files_by_convertor.get(convertor, {}).values())
+
+    def get_convertors(self) -> typing.List[Convertor]:
+        return [
+            convertor for convertor, files in self._files_by_convertor.items() if files
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def split_url_path(url: str) -> typing.Tuple[str, ...]:
+    """
+    Split a URL path into its components, ignoring any empty ones.
+    """
+    return tuple(part for part in url.split("/") if part)
+
+
+def get_relative_url(url: str, from_url: str) -> str:
+    """
+    Return the URL path `url`, relative to the URL path `from_url`, which is
+    treated as a directory. The same as `posixpath.relpath`, except that a
+    trailing slash is kept, and the work of splitting each URL is only done
+    once, rather than for every link.
+
+    Eg. `get_relative_url("/topics/b/", "/topics/a/") == "../b/"`
+    """
+    parts = split_url_path(url)
+    from_parts = split_url_path(from_url)
+    common = 0
+    for part, from_part in zip(parts, from_parts):
+        if part != from_part:
+            break
+        common += 1
+    relative_parts = [".."] * (len(from_parts) - common) + list(parts[common:])
+    path = "/".join(relative_parts) or "."
+    if url.endswith("/"):
+        path += "/"
+    return path
+
 
 class NavGroup:
     """
@@ -203,25 +508,29 @@ class NavPage:
         Return a `url` for the page, depending on the `base_url`, and the
         actively selected page.
         """
+        return self.get_url(self.get_nav().active_page)
+
+    def get_url(self, active_page: typing.Optional["NavPage"]) -> str:
+        """
+        Return a `url` for the page, depending on the `base_url`, and the
+        given `active_page`.
+        """
         nav = self.get_nav()
 
         if nav.base_url is not None:
             # We've got a `base_url` set, so create an absolute URL, using that.
             return urljoin(nav.base_url, self.file.url)
 
-        if nav.active_page is None:
+        if active_page is None:
             # We don't have page actively selected, just return an absolute path.
             return self.file.url
 
-        if nav.active_page is self:
+        if active_page is self:
             # This is the actively selected page.
             return "."
 
         # Return a relative path, from the actively selected page, to this one.
-        path = posixpath.relpath(self.file.url, nav.active_page.file.url)
-        if self.file.url.endswith("/") and not path.endswith("/"):
-            path += "/"
-        return path
+        return get_relative_url(self.file.url, active_page.file.url)
 
 
 class Nav:
@@ -303,6 +612,16 @@ class Nav:
         """
         return self.map_file_to_page.get(file)
 
+    def view(self, file: File) -> "NavView":
+        """
+        Return a read-only view of the navigation, with `file` as the page
+        currently being rendered.
+
+        Unlike `activate()`, this doesn't modify any shared state, so multiple
+        pages may be rendered concurrently.
+        """
+        return NavView(self, self.lookup_page(file))
+
     def activate(self, file: File) -> None:
         """
         Mark `file` as the page currently being rendered.
@@ -330,6 +649,120 @@ class Nav:
         self.active_page = None
 
 
+class NavView:
+    """
+    The site navigation, as seen from a single actively selected page.
+
+    Provides the same interface to templates as `Nav` does while activated,
+    wrapping each item so that `is_active` and `url` are determined relative
+    to the active page.
+    """
+
+    def __init__(self, nav: Nav, active_page: typing.Optional[NavPage]) -> None:
+        self.nav = nav
+        self.base_url = nav.base_url
+        self.active_page = active_page
+
+        # The active page, and any groups that contain it.
+        self.active_items = set()  # type: typing.Set[int]
+        nav_item = typing.cast(typing.Union[None, NavPage, NavGroup], active_page)
+        while nav_item is not None:
+            self.active_items.add(id(nav_item))
+            nav_item = nav_item.parent
+
+        self.items = [self.wrap(item) for item in nav.items]
+
+    def __iter__(self) -> typing.Iterator[typing.Union["NavGroupView", "NavPageView"]]:
+        return iter(self.items)
+
+    def __getitem__(self, idx: int) -> typing.Union["NavGroupView", "NavPageView"]:
+        return self.items[idx]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def wrap(
+        self, item: typing.Union[NavGroup, NavPage]
+    ) -> typing.Union["NavGroupView", "NavPageView"]:
+        if isinstance(item, NavPage):
+            return NavPageView(item, self)
+        return NavGroupView(item, self)
+
+    def lookup_page(self, file: File) -> typing.Optional["NavPageView"]:
+        """
+        If `file` exists within the navigation, then return a view onto the
+        corresponding `NavPage` for it.
+        """
+        page = self.nav.lookup_page(file)
+        return None if page is None else NavPageView(page, self)
+
+
+class NavGroupView:
+    """
+    A `NavGroup`, as seen from the active page of a `NavView`.
+    """
+
+    is_page = False
+    is_group = True
+
+    def __init__(self, group: NavGroup, view: NavView) -> None:
+        self.group = group
+        self.view = view
+        self.title = group.title
+        self.is_active = id(group) in view.active_items
+
+    @property
+    def children(self) -> typing.List[typing.Union["NavGroupView", "NavPageView"]]:
+        return [self.view.wrap(child) for child in self.group.children]
+
+    @property
+    def parent(self) -> typing.Optional["NavGroupView"]:
+        if self.group.parent is None:
+            return None
+        return NavGroupView(self.group.parent, self.view)
+
+
+class NavPageView:
+    """
+    A `NavPage`, as seen from the active page of a `NavView`.
+    """
+
+    is_page = True
+    is_group = False
+
+    def __init__(self, page: NavPage, view: NavView) -> None:
+        self.page = page
+        self.view = view
+        self.title = page.title
+        self.file = page.file
+        self.is_active = id(page) in view.active_items
+
+    @property
+    def url(self) -> str:
+        return self.page.get_url(self.view.active_page)
+
+    @property
+    def parent(self) -> typing.Optional[NavGroupView]:
+        if self.page.parent is None:
+            return None
+        return NavGroupView(self.page.parent, self.view)
+
+    @property
+    def previous(self) -> typing.Optional["NavPageView"]:
+        if self.page.previous is None:
+            return None
+        return NavPageView(self.page.previous, self.view)
+
+    @property
+    def next(self) -> typing.Optional["NavPageView"]:
+        if self.page.next is None:
+            return None
+        return NavPageView(self.page.next, self.view)
+
+
 class Header:
     def __init__(
         self, id: str, name: str, level: int, children: typing.List["Header"] = None
@@ -357,16 +790,78 @@ class Env:
         template_dir: str,
         base_url: str = None,
         config: typing.Dict = None,
+        output: Output = None,
+        profiler: Profiler = None,
     ) -> None:
         self.files = files
         self.nav = nav
         self.base_url = base_url
-        self.template_env = self.get_template_env(template_dir)
+        self.template_dir = template_dir
         self.config = {} if config is None else config
+        # Where any caches that persist between builds are stored, if anywhere.
+        self.cache_dir = self.config.get("build", {}).get("cache_dir")
+        self.template_env = self.get_template_env(template_dir)
+        self.output = output
+        self.profiler = Profiler(enabled=False) if profiler is None else profiler
+        # A lookup of `(hyperlink, input directory)` -> resolved link.
+        # See `get_url`.
+        self.url_cache = {}  # type: typing.Dict[typing.Tuple[str, str], tuple]
+        # See `get_links_digest`.
+        self.links_digest = None  # type: typing.Optional[str]
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        # The template environment can't be pickled, so when an `Env` is sent
+        # to a worker process we recreate it from the template directory.
+        # Each worker starts with an empty URL cache.
+        state = self.__dict__.copy()
+        del state["template_env"]
+        state["url_cache"] = {}
+        return state
+
+    def __setstate__(self, state: typing.Dict[str, typing.Any]) -> None:
+        self.__dict__.update(state)
+        self.template_env = self.get_template_env(self.template_dir)
 
     def get_template_env(self, template_dir: str) -> jinja2.Environment:
-        loader = jinja2.FileSystemLoader(template_dir)
-        return jinja2.Environment(loader=loader)
+        """
+        Return the environment that templates are rendered with.
+
+        Templates are loaded from `template_dir`, unless the `build` config
+        sets `compiled_templates` to a directory of templates that have been
+        precompiled with `mkdocs2.core.compile_templates`, in which case no
+        templates need parsing at all.
+
+        If there's a `cache_dir`, the compiled bytecode of each template is
+        stored there, and reused for as long as the template source matches.
+        """
+        compiled_templates = self.config.get("build", {}).get("compiled_templates")
+        if compiled_templates is not None:
+            loader = jinja2.ModuleLoader(compiled_templates)  # type: jinja2.BaseLoader
+        else:
+            loader = jinja2.FileSystemLoader(template_dir)
+
+        bytecode_cache = None
+        if self.cache_dir is not None:
+            bytecode_dir = os.path.join(self.cache_dir, "templates")
+            os.makedirs(bytecode_dir, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_dir)
+        return jinja2.Environment(loader=loader, bytecode_cache=bytecode_cache)
+
+    def get_links_digest(self) -> str:
+        """
+        Return a digest of everything that determines how links between
+        files are resolved: the input and output path of every file, and
+        the base URL.
+        """
+        if self.links_digest is None:
+            digest = hashlib.sha1()
+            digest.update(f"{self.base_url}\0".encode("utf-8"))
+            for file in self.files:
+                digest.update(
+                    f"{file.input_path}\0{file.output_path}\0".encode("utf-8")
+                )
+            self.links_digest = digest.hexdigest()
+        return self.links_digest
 
     def get_url(self, hyperlink: str, from_file: File) -> str:
         """
@@ -377,15 +872,42 @@ class Env:
 
         * We can resolve any relative paths, against that file.
         * We can output the final URL as a relative path, if no base URL is set.
+
+        Links are resolved once for each input directory that they're
+        referenced from, and cached, since templates typically include the
+        same links on every page.
+        """
+        key = (hyperlink, os.path.dirname(from_file.input_path))
+        try:
+            file, suffix = self.url_cache[key]
+        except KeyError:
+            file, suffix = self.url_cache[key] = self.resolve_url(*key)
+
+        if file is None:
+            # The URL doesn't depend on the file we're linking from.
+            return suffix
+        # No `base_url` to use. Create a relative URL.
+        return get_relative_url(file.url, from_file.url) + suffix
+
+    def resolve_url(
+        self, hyperlink: str, from_dir: str
+    ) -> typing.Tuple[typing.Optional[File], str]:
+        """
+        Resolve a `hyperlink`, referenced from a file in the input directory
+        `from_dir`, for `get_url`.
+
+        Returns a two-tuple of either `(file, suffix)` if the final URL is
+        the path to `file`, relative to the referencing file, followed by the
+        `suffix`, or `(None, url)` if the final URL is just `url`.
         """
         scheme, netloc, path, params, query, fragment = urlparse(hyperlink)
         if scheme and netloc:
             # Leave any absolute URLs as they are.
-            return hyperlink
+            return (None, hyperlink)
 
         if not scheme and not netloc and not path:
             # Leave any params/query/frament only URLs as they are:
-            return hyperlink
+            return (None, hyperlink)
 
         if path.startswith("/"):
             # Determine possible file that an absolute path URL might point to.
@@ -393,7 +915,7 @@ class Env:
         else:
             # Determine possible file that a relative path URL might point to.
             file_path = path.replace("/", os.path.sep)
-            file_path = os.path.join(os.path.dirname(from_file.input_path), file_path)
+            file_path = os.path.join(from_dir, file_path)
             file_path = os.path.normpath(file_path)
 
         try:
@@ -403,18 +925,44 @@ class Env:
             # If the path links to a built URL, use that.
             file = self.files.get_by_url_path(path)
 
+        # Any `params`, `query`, or `fragment` components that were present.
+        suffix = urlunparse(("", "", "", params, query, fragment))
+
         if self.base_url is None:
-            # No `base_url` to use. Create a relative URL.
-            scheme, netloc, path = ("", "", posixpath.relpath(file.url, from_file.url))
-            if file.url.endswith("/") and not path.endswith("/"):
-                path += "/"
-        else:
-            # Create an absolute URL, using the `base_url`.
-            scheme, netloc, path, _, _, _ = urlparse(urljoin(self.base_url, file.url))
+            return (file, suffix)
 
-        # Include any `params`, `query`, or `fragment` components that were present.
-        return urlunparse((scheme, netloc, path, params, query, fragment))
+        # Create an absolute URL, using the `base_url`.
+        scheme, netloc, path, _, _, _ = urlparse(urljoin(self.base_url, file.url))
+        return (None, urlunparse((scheme, netloc, path, params, query, fragment)))
 
     def render_template(self, template_path: str, context: dict) -> str:
-        template = self.template_env.get_template(template_path)
-        return template.render(context)
+        with self.profiler.measure(template_path, "render_template"):
+            template = self.template_env.get_template(template_path)
+            return template.render(context)
+
+    def stream_template(
+        self,
+        template_path: str,
+        context: dict,
+        output_file: typing.TextIO,
+        buffer_size: int = 64 * 1024,
+    ) -> None:
+        """
+        Render a template directly to `output_file`, rather than into a string.
+
+        The rendered chunks are written out each time they add up to more
+        than `buffer_size` characters, so the full page is never held in
+        memory at once.
+        """
+        with self.profiler.measure(template_path, "render_template"):
+            template = self.template_env.get_template(template_path)
+            buffer = []  # type: typing.List[str]
+            buffered = 0
+            for chunk in template.generate(context):
+                buffer.append(chunk)
+                buffered += len(chunk)
+                if buffered >= buffer_size:
+                    output_file.write("".join(buffer))
+                    buffer.clear()
+                    buffered = 0
+            output_file.write("".join(buffer))
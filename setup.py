@@ -68,6 +68,7 @@ setup(
     long_description_content_type='text/markdown',
     author='Tom Christie',
     author_email='tom@tomchristie.com',
+    python_requires='>=3.8',
     packages=get_packages(PACKAGE),
     package_data=get_package_data(PACKAGE),
     install_requires=[
@@ -86,8 +87,10 @@ setup(
         'Topic :: Internet :: WWW/HTTP',
         'Programming Language :: Python :: 3',
         'Programming Language :: Python :: 3 :: Only',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Programming Language :: Python :: Implementation :: PyPy',
         'Programming Language :: Python :: Implementation :: CPython'
     ],
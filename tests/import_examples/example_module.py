@@ -18,3 +18,6 @@ class ExampleClass:
         A method *docstring*.
         """
         pass  # pragma: nocover
+
+
+EXAMPLE_CONSTANT = 1
@@ -0,0 +1,73 @@
+from benchmarks.run import compare_to_baseline, main
+from benchmarks.sitegen import generate_site, get_page_path
+from click.testing import CliRunner
+import json
+import mkdocs2
+import os
+import sys
+
+
+def test_generate_site(tmpdir):
+    config = generate_site(str(tmpdir), pages=12, nav_depth=2, fanout=3, assets=2)
+    sys.path.insert(0, str(tmpdir))
+    try:
+        mkdocs2.build(config)
+    finally:
+        sys.path.remove(str(tmpdir))
+
+    output_dir = config["build"]["output_dir"]
+    page = os.path.join(output_dir, "section-1", "page-3", "index.html")
+    with open(page) as page_file:
+        html = page_file.read()
+    assert "Class0" in html
+    assert 'class="codehilite"' in html
+    assert os.path.exists(os.path.join(output_dir, "assets", "asset-1.bin"))
+    assert list(config["nav"]) == ["Home", "Section 0", "Section 1", "Section 2"]
+
+
+def test_get_page_path():
+    assert get_page_path(7, nav_depth=3, fanout=5) == "section-0/section-1/page-7.md"
+    assert get_page_path(7, nav_depth=1, fanout=5) == "page-7.md"
+
+
+def test_compare_to_baseline():
+    baseline = {"full_build": 1.0, "memory_peak": 10.0}
+    results = {"full_build": 1.1, "memory_peak": 13.0, "serve_cold_start": 1.0}
+    assert compare_to_baseline(results, baseline, tolerance=0.2) == ["memory_peak"]
+
+
+def test_benchmark_command(tmpdir):
+    baseline_path = os.path.join(tmpdir, "baseline.json")
+    args = ["--pages", "5", "--assets", "1", "--repeat", "1"]
+    args += ["--baseline", baseline_path]
+    runner = CliRunner()
+
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0
+    assert "No baseline" in result.output
+
+    result = runner.invoke(main, args + ["--save-baseline"])
+    assert result.exit_code == 0
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    assert set(baseline["results"]) == {
+        "full_build",
+        "incremental_noop",
+        "incremental_one_page",
+        "serve_cold_start",
+        "memory_peak",
+    }
+    assert baseline["settings"] == {"jobs": 1, "warm_cache": False}
+
+    result = runner.invoke(main, args + ["--tolerance", "100"])
+    assert result.exit_code == 0
+    assert "baseline" in result.output
+
+    result = runner.invoke(main, args + ["--tolerance", "-1"])
+    assert result.exit_code == 1
+    assert "REGRESSION" in result.output
+
+    # Baselines are only compared against runs with the same settings.
+    result = runner.invoke(main, args + ["--warm-cache", "--tolerance", "-1"])
+    assert result.exit_code == 0
+    assert "No baseline" in result.output
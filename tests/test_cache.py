@@ -0,0 +1,22 @@
+from mkdocs2.cache import DiskCache
+import json
+import os
+
+
+def test_disk_cache(tmpdir):
+    cache = DiskCache(str(tmpdir), "example")
+    assert cache.get("a") is None
+
+    cache.set("a", {"value": [1, 2, 3]})
+    assert cache.get("a") == {"value": [1, 2, 3]}
+    assert cache.get_path("a").startswith(os.path.join(tmpdir, "example"))
+
+    # Overwriting an entry replaces it.
+    cache.set("a", "new")
+    assert cache.get("a") == "new"
+
+    # An entry for a different key, at the same path, is ignored.
+    os.makedirs(os.path.dirname(cache.get_path("b")), exist_ok=True)
+    with open(cache.get_path("b"), "w") as cache_file:
+        json.dump({"key": "other", "value": 1}, cache_file)
+    assert cache.get("b") is None
@@ -1,5 +1,6 @@
 from click.testing import CliRunner
 from mkdocs2.cli import cli
+import json
 import os
 
 
@@ -59,3 +60,57 @@ convertors:
     runner = CliRunner()
     result = runner.invoke(cli, ["build"])
     assert result.exit_code == 0
+
+    result = runner.invoke(cli, ["build", "--profile", "--profile-trace", "trace.json"])
+    assert result.exit_code == 0
+    assert "gather_files" in result.output
+    assert "MarkdownPages.convert" in result.output
+    assert "index.html" in result.output
+    with open(os.path.join(tmpdir, "trace.json")) as trace_file:
+        trace = json.load(trace_file)
+    categories = {event["cat"] for event in trace["traceEvents"]}
+    assert categories == {
+        "build",
+        "gather_files",
+        "load_nav",
+        "build_toc",
+        "convert",
+        "render_template",
+    }
+
+
+def test_compile_templates(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "index.md"), "# index")
+    write_file(
+        os.path.join(template_dir, "base.html"),
+        '{% include "content.html" %}',
+    )
+    write_file(os.path.join(template_dir, "content.html"), "<body>{{ content }}</body>")
+    write_file(
+        os.path.join(tmpdir, "mkdocs.yml"),
+        """
+build:
+    input_dir: input
+    output_dir: output
+    template_dir: templates
+    compiled_templates: compiled
+    cache_dir: cache
+convertors:
+    - mkdocs2.convertors.MarkdownPages
+""",
+    )
+
+    os.chdir(tmpdir)
+    runner = CliRunner()
+    result = runner.invoke(cli, ["compile-templates", "compiled"])
+    assert result.exit_code == 0
+    assert len(os.listdir(os.path.join(tmpdir, "compiled"))) == 2
+
+    # Builds use the compiled templates, rather than the sources.
+    os.remove(os.path.join(template_dir, "content.html"))
+    result = runner.invoke(cli, ["build", "--incremental"])
+    assert result.exit_code == 0
+    with open(os.path.join(tmpdir, "output", "index.html")) as output_file:
+        assert output_file.read().startswith('<body><h1 id="index">')
@@ -0,0 +1,391 @@
+import json
+import mkdocs2
+import os
+import pickle
+from mkdocs2 import types
+from mkdocs2.cache import DiskCache
+from mkdocs2.core import build_toc, convert, load_env
+from mkdocs2.convertors import MarkdownPages, Search, StaticFiles
+from mkdocs2.file_copy import hash_file
+from mkdocs2.search import decode_postings
+
+
+def write_file(path, text):
+    """
+    Helper function to write 'text' to the file at 'path'.
+    """
+    dirname = os.path.dirname(path)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(path, "w") as output:
+        output.write(text)
+
+
+def test_markdown_pages_reuses_markdown_instances(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "a.md"), "# a\n[b](b.md)")
+    write_file(os.path.join(input_dir, "b.md"), "# b\n[a](a.md)")
+
+    convertor = MarkdownPages()
+    files = types.Files(
+        [
+            types.File(
+                input_path="a.md",
+                output_path=os.path.join("a", "index.html"),
+                input_dir=input_dir,
+                output_dir=output_dir,
+                convertor=convertor,
+            ),
+            types.File(
+                input_path="b.md",
+                output_path=os.path.join("b", "index.html"),
+                input_dir=input_dir,
+                output_dir=output_dir,
+                convertor=convertor,
+            ),
+        ]
+    )
+    env = types.Env(files=files, nav=types.Nav([]), template_dir=template_dir)
+
+    toc_a = convertor.build_toc(files[0], env)
+    toc_b = convertor.build_toc(files[1], env)
+    assert len(convertor._markdown_pool) == 1
+
+    # Each page is converted with its own URLs and table of contents.
+    assert [header.id for header in toc_a.headers] == ["a"]
+    assert [header.id for header in toc_b.headers] == ["b"]
+    assert 'href="../b/"' in files[0].content
+    assert 'href="../a/"' in files[1].content
+
+    # Pages are only indexed for search if a convertor uses the entries.
+    assert files[0].search_index is None
+    search = Search()
+    files.append(types.File("", "search_index.json", "", output_dir, search))
+    convertor.build_toc(files[0], env)
+    assert files[0].search_index == [{"ref": "a", "title": "a", "text": "b "}]
+    assert len(convertor._markdown_pool) == 1
+
+    # Pooled instances aren't sent along when the convertor is pickled.
+    convertor = pickle.loads(pickle.dumps(convertor))
+    assert convertor._markdown_pool == []
+    convertor.build_toc(files[0], env)
+    assert len(convertor._markdown_pool) == 1
+
+
+def test_markdown_pages_fragment_cache(tmpdir, monkeypatch):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    template_dir = os.path.join(tmpdir, "templates")
+    base_html = os.path.join(template_dir, "base.html")
+    write_file(os.path.join(input_dir, "index.md"), "# index\n[a](a.md)")
+    write_file(os.path.join(input_dir, "a.md"), "# a\n[index](index.md)")
+    write_file(base_html, "<body>{{ content }}</body>")
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+            "cache_dir": os.path.join(tmpdir, "cache"),
+        },
+        "convertors": ["mkdocs2.convertors.MarkdownPages"],
+    }
+
+    converted = []
+    convert_markdown = MarkdownPages.convert_markdown
+
+    def record_convert_markdown(self, text, file, env):
+        converted.append(file.input_path)
+        return convert_markdown(self, text, file, env)
+
+    def read_output(path):
+        with open(os.path.join(output_dir, path)) as output_file:
+            return output_file.read()
+
+    monkeypatch.setattr(MarkdownPages, "convert_markdown", record_convert_markdown)
+    mkdocs2.build(config, incremental=True)
+    assert sorted(converted) == ["a.md", "index.md"]
+
+    # Changing the templates rebuilds every page, from the cached content.
+    converted.clear()
+    write_file(base_html, "<main>{{ content }}</main>")
+    mkdocs2.build(config, incremental=True)
+    assert converted == []
+    assert read_output("index.html").startswith('<main><h1 id="index">')
+    assert 'href="a/"' in read_output("index.html")
+
+    # Changing a page only converts that page.
+    converted.clear()
+    write_file(os.path.join(input_dir, "a.md"), "# a, modified")
+    mkdocs2.build(config)
+    assert converted == ["a.md"]
+
+    # Adding a page changes how links are resolved, so content isn't reused.
+    converted.clear()
+    write_file(os.path.join(input_dir, "b.md"), "# b")
+    mkdocs2.build(config)
+    assert sorted(converted) == ["a.md", "b.md", "index.md"]
+
+
+def test_markdown_pages_fragment_dependencies(tmpdir):
+    dependency = os.path.join(tmpdir, "module.py")
+    write_file(dependency, "x = 1")
+    cache = DiskCache(os.path.join(tmpdir, "cache"), "fragments")
+    convertor = MarkdownPages()
+    fragment = {
+        "content": "<p>x</p>",
+        "toc_tokens": [],
+        "dependencies": [dependency],
+        "search_index": [],
+    }
+
+    convertor.save_fragment(cache, "key", fragment)
+    assert convertor.load_fragment(cache, "key") == fragment
+    assert convertor.load_fragment(cache, "missing") is None
+
+    # Changes to any dependencies invalidate the cached content.
+    write_file(dependency, "x = 2")
+    assert convertor.load_fragment(cache, "key") is None
+
+
+def test_static_files_skip_unchanged(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    input_path = os.path.join(input_dir, "js", "app.js")
+    output_path = os.path.join(output_dir, "js", "app.js")
+    write_file(input_path, "xxx")
+
+    def copy(**options):
+        convertor = StaticFiles(**options)
+        file = types.File(
+            input_path=os.path.join("js", "app.js"),
+            output_path=os.path.join("js", "app.js"),
+            input_dir=input_dir,
+            output_dir=output_dir,
+            convertor=convertor,
+        )
+        convertor.convert(file, env=None)
+        with open(output_path) as output:
+            return output.read()
+
+    assert copy() == "xxx"
+
+    # Modify the output, but leave the size and modification time unchanged.
+    stat = os.stat(output_path)
+    write_file(output_path, "yyy")
+    os.utime(output_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert copy(compare="mtime") == "yyy"
+    write_file(output_path, "yyyy")
+    assert copy(compare="mtime") == "xxx"
+    write_file(output_path, "yyy")
+    os.utime(output_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert copy(compare="hash") == "xxx"
+    write_file(output_path, "yyy")
+    assert copy(compare="none") == "xxx"
+
+    # Links and clones.
+    assert copy(compare="none", method="hardlink") == "xxx"
+    assert os.path.samefile(input_path, output_path)
+    assert copy(compare="none", method="reflink") == "xxx"
+    assert not os.path.samefile(input_path, output_path)
+    assert os.stat(input_path).st_mtime_ns == os.stat(output_path).st_mtime_ns
+
+
+def test_assets(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "index.md"), "[css](css/base.css)")
+    write_file(os.path.join(input_dir, "css", "base.css"), "body {}")
+    write_file(os.path.join(input_dir, "img.png"), "png")
+    write_file(
+        os.path.join(template_dir, "base.html"),
+        "{{ url('/css/base.css') }} {{ url('/css/highlight.css') }} {{ content }}",
+    )
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+            "cache_dir": os.path.join(tmpdir, "cache"),
+        },
+        "convertors": [
+            "mkdocs2.convertors.MarkdownPages",
+            {"mkdocs2.convertors.Assets": {"hash_length": 6}},
+            "mkdocs2.convertors.StaticFiles",
+            {"mkdocs2.convertors.CodeHighlight": {"fingerprint": True}},
+        ],
+    }
+
+    mkdocs2.build(config, incremental=True)
+    css_digest = hash_file(os.path.join(input_dir, "css", "base.css"))[:6]
+    css_path = f"css/base.{css_digest}.css"
+    (highlight_path,) = [
+        f"css/{name}"
+        for name in os.listdir(os.path.join(output_dir, "css"))
+        if name.startswith("highlight.")
+    ]
+    assert len(highlight_path) == len("css/highlight.12345678.css")
+    assert sorted(os.listdir(os.path.join(output_dir, "css"))) == sorted(
+        [os.path.basename(css_path), os.path.basename(highlight_path)]
+    )
+    assert os.path.exists(os.path.join(output_dir, "img.png"))
+
+    # Links from both templates and Markdown use the fingerprinted paths.
+    with open(os.path.join(output_dir, "index.html")) as index_file:
+        html = index_file.read()
+    assert html.startswith(f"{css_path} {highlight_path} ")
+    assert f'href="{css_path}"' in html
+
+    # A changed asset is output to a new path, and the old one is removed.
+    write_file(os.path.join(input_dir, "css", "base.css"), "body { margin: 0 }")
+    mkdocs2.build(config, incremental=True)
+    css_digest = hash_file(os.path.join(input_dir, "css", "base.css"))[:6]
+    assert sorted(os.listdir(os.path.join(output_dir, "css"))) == sorted(
+        [f"base.{css_digest}.css", os.path.basename(highlight_path)]
+    )
+    with open(os.path.join(output_dir, "index.html")) as index_file:
+        assert index_file.read().startswith(f"css/base.{css_digest}.css ")
+
+
+def test_search(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    template_dir = os.path.join(tmpdir, "templates")
+    search_json = os.path.join(output_dir, "search_index.json")
+    write_file(os.path.join(input_dir, "index.md"), "# Home\n\nWelcome home.")
+    write_file(os.path.join(input_dir, "a.md"), "# Topic A\n\nBuilding docs.")
+    write_file(os.path.join(template_dir, "base.html"), "{{ content }}")
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+            "cache_dir": os.path.join(tmpdir, "cache"),
+        },
+        "convertors": [
+            "mkdocs2.convertors.MarkdownPages",
+            {"mkdocs2.convertors.Search": {"prebuilt": True}},
+        ],
+    }
+
+    mkdocs2.build(config, incremental=True)
+    with open(search_json) as search_file:
+        search_index = json.load(search_file)
+    assert search_index["docs"] == [
+        {"location": "a/#topic-a", "title": "Topic A", "text": "Building docs."},
+        {"location": "#home", "title": "Home", "text": "Welcome home."},
+    ]
+    terms = search_index["index"]["terms"]
+    assert decode_postings(terms["build"]) == [(0, 1)]
+    assert decode_postings(terms["home"]) == [(1, 2)]
+
+    # Unchanged pages are parsed for the index, in an incremental build.
+    write_file(os.path.join(input_dir, "a.md"), "# Topic A\n\nChanged.")
+    mkdocs2.build(config, incremental=True)
+    with open(search_json) as search_file:
+        search_index = json.load(search_file)
+    assert [doc["text"] for doc in search_index["docs"]] == [
+        "Changed.",
+        "Welcome home.",
+    ]
+
+
+def test_search_empty_page(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "a.md"), "# Hello\n\nWorld.")
+    write_file(os.path.join(input_dir, "b.md"), "")
+    write_file(os.path.join(input_dir, "index.md"), "")
+    write_file(os.path.join(template_dir, "base.html"), "{{ content }}")
+
+    for jobs in (1, 2):
+        output_dir = os.path.join(tmpdir, f"output-{jobs}")
+        config = {
+            "build": {
+                "input_dir": input_dir,
+                "output_dir": output_dir,
+                "template_dir": template_dir,
+            },
+            "convertors": [
+                "mkdocs2.convertors.MarkdownPages",
+                {"mkdocs2.convertors.Search": {"prebuilt": True}},
+            ],
+        }
+
+        # Empty pages have no entries, even when converted after other pages.
+        mkdocs2.build(config, jobs=jobs)
+        with open(os.path.join(output_dir, "search_index.json")) as search_file:
+            search_index = json.load(search_file)
+        assert search_index["docs"] == [
+            {"location": "a/#hello", "title": "Hello", "text": "World."}
+        ]
+
+
+def test_search_shards(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "index.md"), "# Home\n\nWelcome home.")
+    write_file(os.path.join(input_dir, "a.md"), "# Topic A\n\nBuilding docs.")
+    write_file(os.path.join(input_dir, "b.md"), "# Topic B\n\n2 docs.")
+    write_file(os.path.join(template_dir, "base.html"), "{{ content }}")
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+        },
+        "convertors": [
+            "mkdocs2.convertors.MarkdownPages",
+            {"mkdocs2.convertors.Search": {"path": "search/index.json", "shards": 4}},
+        ],
+    }
+
+    def load(path):
+        with open(os.path.join(output_dir, path)) as shard_file:
+            return json.load(shard_file)
+
+    mkdocs2.build(config)
+    manifest = load("search/index.json")
+    assert manifest["docs"][-1] == "search/index/docs-3.json"
+    assert manifest["terms"]["d"] == "search/index/terms-d.json"
+    assert len(manifest["terms"]) == 37
+    shards = [load(path) for path in manifest["docs"]]
+    assert [len(shard) for shard in shards] == [2, 0, 0, 1]
+
+    def get_doc(document_id):
+        return shards[document_id % 4][document_id // 4]
+
+    docs_terms = load(manifest["terms"]["d"])
+    titles = [get_doc(idx)["title"] for idx, _ in decode_postings(docs_terms["doc"])]
+    assert titles == ["Topic A", "Topic B"]
+    assert "2" in load(manifest["terms"]["2"])
+    assert load(manifest["terms"]["_"]) == {}
+
+    # Pages don't keep their entries once they're added to the index.
+    env = load_env(config)
+    (search_file,) = [file for file in env.files if file.input_path == ""]
+    pages = [file for file in env.files if file.input_path]
+    for file in env.files:
+        build_toc(file, env)
+    assert all(page.search_index for page in pages)
+    convert(search_file, env)
+    assert all(page.search_index is None for page in pages)
+
+    # Shards above the current count are removed.
+    config["convertors"][1]["mkdocs2.convertors.Search"]["shards"] = 2
+    mkdocs2.build(config)
+    assert sorted(os.listdir(os.path.join(output_dir, "search", "index")))[:3] == [
+        "docs-0.json",
+        "docs-1.json",
+        "terms-0.json",
+    ]
+
+    # As are all of the shards, if the index is no longer sharded.
+    config["convertors"][1]["mkdocs2.convertors.Search"]["shards"] = 0
+    mkdocs2.build(config)
+    assert os.listdir(os.path.join(output_dir, "search", "index")) == []
+    assert "docs" in load("search/index.json")
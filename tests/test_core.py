@@ -1,7 +1,10 @@
 import os
+import pickle
 import mkdocs2
 import pytest
-from mkdocs2.core import import_from_string
+from mkdocs2.core import import_from_string, load_env
+from mkdocs2.manifest import MANIFEST_PATH, BuildManifest, get_stat_info, is_unchanged
+from mkdocs2.profiling import Profiler
 
 
 def write_file(path, text):
@@ -59,6 +62,33 @@ def test_build(tmpdir):
         assert os.path.exists(path)
 
 
+def test_build_convertor_options(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "img", "favicon.ico"), "xxx")
+    write_file(os.path.join(template_dir, "base.html"), "{{ content }}")
+
+    # Convertors may be given as a mapping of the import string to any
+    # options, which may also be left empty.
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+        },
+        "convertors": [
+            {"mkdocs2.convertors.CodeHighlight": {"path": "css/code.css"}},
+            {"mkdocs2.convertors.StaticFiles": None},
+        ],
+    }
+    mkdocs2.build(config=config)
+
+    assert os.path.exists(os.path.join(output_dir, "img", "favicon.ico"))
+    assert os.path.exists(os.path.join(output_dir, "css", "code.css"))
+    assert not os.path.exists(os.path.join(output_dir, "css", "highlight.css"))
+
+
 def test_import_from_string():
     cls = import_from_string("mkdocs2.convertors.MarkdownPages")
     assert issubclass(cls, mkdocs2.types.Convertor)
@@ -70,4 +100,293 @@ def test_import_from_string():
         import_from_string("mkdocs2.convertors.InvalidAttribute")
 
     with pytest.raises(ImportError):
-        import_from_string("tests.import_examples.raise_unrelated_import_error.SOME_ATTRIBUTE")
+        import_from_string(
+            "tests.import_examples.raise_unrelated_import_error.SOME_ATTRIBUTE"
+        )
+
+
+def test_incremental_build(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    cache_dir = os.path.join(tmpdir, "cache")
+    template_dir = os.path.join(tmpdir, "templates")
+    a_md = os.path.join(input_dir, "a.md")
+    b_md = os.path.join(input_dir, "b.md")
+    a_html = os.path.join(output_dir, "a", "index.html")
+    b_html = os.path.join(output_dir, "b", "index.html")
+    base_html = os.path.join(template_dir, "base.html")
+    write_file(a_md, "# a")
+    write_file(b_md, "# b")
+    write_file(base_html, "<html><body>{{ content }}</body></html>")
+
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+            "cache_dir": cache_dir,
+        },
+        "convertors": ["mkdocs2.convertors.MarkdownPages"],
+    }
+    mkdocs2.build(config=config, incremental=True)
+    assert os.path.exists(os.path.join(cache_dir, MANIFEST_PATH))
+    assert not os.path.exists(os.path.join(output_dir, MANIFEST_PATH))
+
+    # Mark the existing outputs, so that we can tell if they get rebuilt.
+    write_file(a_html, "unchanged")
+    write_file(b_html, "unchanged")
+
+    # Only the modified page should be rebuilt.
+    write_file(b_md, "# b modified")
+    mkdocs2.build(config=config, incremental=True)
+    with open(a_html) as output:
+        assert output.read() == "unchanged"
+    with open(b_html) as output:
+        assert "b modified" in output.read()
+
+    # Removing a page should remove its output, and since the set of files
+    # has changed, every other page gets rebuilt.
+    os.remove(b_md)
+    mkdocs2.build(config=config, incremental=True)
+    assert not os.path.exists(b_html)
+    with open(a_html) as output:
+        assert output.read() != "unchanged"
+
+    # Template changes cause a full rebuild.
+    write_file(a_html, "unchanged")
+    write_file(base_html, "<html><body>{{ content }}</body></html>\n")
+    mkdocs2.build(config=config, incremental=True)
+    with open(a_html) as output:
+        assert output.read() != "unchanged"
+
+    # Full builds update the manifest, so that reverting a change made
+    # since the last incremental build still rebuilds the page.
+    write_file(a_md, "# a modified")
+    mkdocs2.build(config=config)
+    write_file(a_md, "# a")
+    mkdocs2.build(config=config, incremental=True)
+    with open(a_html) as output:
+        assert "a modified" not in output.read()
+
+    # Without a cache directory there's no manifest, so every page is built.
+    del config["build"]["cache_dir"]
+    write_file(a_html, "unchanged")
+    mkdocs2.build(config=config, incremental=True)
+    with open(a_html) as output:
+        assert output.read() != "unchanged"
+
+
+def test_build_manifest(tmpdir):
+    input_path = os.path.join(tmpdir, "input.txt")
+    cache_dir = os.path.join(tmpdir, "cache")
+    write_file(input_path, "xxx")
+
+    # Files are unchanged if their contents match, even if the mtime differs.
+    info = get_stat_info(input_path)
+    assert is_unchanged(input_path, info)
+    assert is_unchanged(input_path, dict(info, mtime=0))
+    assert not is_unchanged(input_path, dict(info, mtime=0, hash=""))
+
+    # Without a hash, any change to the mtime counts as a change.
+    info = get_stat_info(input_path, include_hash=False)
+    assert info["hash"] is None
+    assert is_unchanged(input_path, info)
+    assert not is_unchanged(input_path, dict(info, mtime=0))
+    os.remove(input_path)
+    assert not is_unchanged(input_path, info)
+
+    # Saving creates the cache directory, if there isn't one yet.
+    manifest = BuildManifest(fingerprint="abc", entries={"a.html": {}})
+    manifest.save(cache_dir)
+    manifest = BuildManifest.load(cache_dir)
+    assert manifest.fingerprint == "abc"
+    assert manifest.entries == {"a.html": {}}
+
+
+def test_markdown_pages_read_once(tmpdir, monkeypatch):
+    """
+    Each markdown page should be read and parsed once, with the table of
+    contents derived from the same parse as the page content.
+    """
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    template_dir = os.path.join(tmpdir, "templates")
+    index_md = os.path.join(input_dir, "index.md")
+    base_html = os.path.join(template_dir, "base.html")
+    write_file(index_md, "# index\n\n```\n# not a header\n```\n\n## section")
+    write_file(
+        base_html,
+        "{% for header in toc.headers %}{{ header.id }} {% endfor %}{{ content }}",
+    )
+
+    reads = []
+    read_input_text = mkdocs2.types.File.read_input_text
+
+    def counting_read_input_text(self):
+        reads.append(self.input_path)
+        return read_input_text(self)
+
+    monkeypatch.setattr(mkdocs2.types.File, "read_input_text", counting_read_input_text)
+
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+        },
+        "convertors": ["mkdocs2.convertors.MarkdownPages"],
+    }
+    mkdocs2.build(config=config)
+
+    assert reads == ["index.md"]
+    with open(os.path.join(output_dir, "index.html")) as output:
+        assert output.read().startswith("index ")
+
+
+def test_parallel_build(tmpdir):
+    """
+    Building with multiple worker processes should produce output identical
+    to a serial build.
+    """
+    input_dir = os.path.join(tmpdir, "input")
+    template_dir = os.path.join(tmpdir, "templates")
+    base_html = os.path.join(template_dir, "base.html")
+    write_file(os.path.join(input_dir, "index.md"), "# index\n[a](topics/a.md)")
+    write_file(os.path.join(input_dir, "topics", "a.md"), "# a\n[b](b.md)")
+    write_file(os.path.join(input_dir, "topics", "b.md"), "# b\n[index](../index.md)")
+    write_file(os.path.join(input_dir, "img", "favicon.ico"), "xxx")
+    write_file(
+        base_html,
+        "{% for item in nav %}{{ item.title }} {{ item.is_active }} "
+        "{% for child in item.children %}{{ child.url }} {{ child.is_active }} "
+        "{% endfor %}{% endfor %}"
+        "{{ current_page.next.url }} {{ current_page.previous.url }} "
+        "{% for header in toc.headers %}{{ header.id }}{% endfor %}{{ content }}",
+    )
+
+    outputs = {}
+    for jobs in (1, 2):
+        output_dir = os.path.join(tmpdir, f"output-{jobs}")
+        config = {
+            "build": {
+                "input_dir": input_dir,
+                "output_dir": output_dir,
+                "template_dir": template_dir,
+            },
+            "nav": {
+                "Homepage": "index.md",
+                "Topics": {"Topic A": "topics/a.md", "Topic B": "topics/b.md"},
+            },
+            "convertors": [
+                "mkdocs2.convertors.MarkdownPages",
+                "mkdocs2.convertors.CodeHighlight",
+                "mkdocs2.convertors.StaticFiles",
+                "mkdocs2.convertors.Search",
+            ],
+        }
+        mkdocs2.build(config=config, jobs=jobs)
+
+        outputs[jobs] = {}
+        for dirpath, dirnames, filenames in os.walk(output_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, "rb") as output:
+                    outputs[jobs][os.path.relpath(path, output_dir)] = output.read()
+
+    assert len(outputs[1]) == 6
+    assert outputs[1] == outputs[2]
+
+
+def test_pickle_env(tmpdir):
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(template_dir, "base.html"), "{{ content }}")
+    env = mkdocs2.types.Env(
+        files=mkdocs2.types.Files(),
+        nav=mkdocs2.types.Nav([]),
+        template_dir=template_dir,
+    )
+    env = pickle.loads(pickle.dumps(env))
+    assert env.render_template("base.html", {"content": "abc"}) == "abc"
+
+
+def test_load_env(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    write_file(os.path.join(input_dir, "index.md"), "# index")
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": os.path.join(tmpdir, "templates"),
+        },
+        "convertors": ["mkdocs2.convertors.MarkdownPages"],
+    }
+
+    # Files are written to the output directory, unless another output is given.
+    env = load_env(config)
+    assert isinstance(env.output, mkdocs2.types.DiskOutput)
+    assert env.output.output_dir == output_dir
+    (file,) = env.files
+    assert file.output is env.output
+    assert file.full_output_path == os.path.join(output_dir, "index.html")
+
+    # Nothing is built, or written, until the files are converted.
+    assert file.content is None
+    assert not os.path.exists(output_dir)
+
+
+def test_parallel_build_profile(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "index.md"), "# index")
+    write_file(os.path.join(input_dir, "a.md"), "# a")
+    write_file(os.path.join(template_dir, "base.html"), "{{ content }}")
+
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+        },
+        "convertors": ["mkdocs2.convertors.MarkdownPages"],
+    }
+    profiler = Profiler()
+    mkdocs2.build(config=config, jobs=2, profiler=profiler)
+
+    # Events recorded in the worker processes are gathered by the main process.
+    converted = [
+        event["name"] for event in profiler.events if event["cat"] == "convert"
+    ]
+    assert sorted(converted) == ["a/index.html", "index.html"]
+    summary = profiler.get_summary(slowest=1)
+    assert "MarkdownPages.build_toc" in summary
+    assert "Slowest 1 files:" in summary
+
+
+def test_template_bytecode_cache(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    template_dir = os.path.join(tmpdir, "templates")
+    cache_dir = os.path.join(tmpdir, "cache")
+    base_html = os.path.join(template_dir, "base.html")
+    write_file(os.path.join(input_dir, "index.md"), "# index")
+    write_file(base_html, "<body>{{ content }}</body>")
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "template_dir": template_dir,
+            "cache_dir": cache_dir,
+        },
+        "convertors": ["mkdocs2.convertors.MarkdownPages"],
+    }
+
+    mkdocs2.build(config)
+    assert len(os.listdir(os.path.join(cache_dir, "templates"))) == 1
+
+    # The cached bytecode isn't used once the template changes.
+    write_file(base_html, "<main>{{ content }}</main>")
+    mkdocs2.build(config)
+    with open(os.path.join(output_dir, "index.html")) as output_file:
+        assert output_file.read().startswith('<main><h1 id="index">')
@@ -1,7 +1,10 @@
 from markdown import Markdown
 from markdown.extensions.toc import TocExtension
-from mkdocs2.markdown_extensions.autodoc import AutoDocExtension, trim_docstring, get_params
+from mkdocs2.markdown_extensions import autodoc
+from mkdocs2.markdown_extensions.autodoc import AutoDocCache, AutoDocExtension, trim_docstring, get_params
 import inspect
+import os
+import pickle
 
 
 def test_autodoc_function():
@@ -112,6 +115,9 @@ def test_trim_docstring():
 
 
 def test_get_params():
+    def positional_only(x, y, /, z=None):
+        pass  # pragma: nocover
+
     def generics(*args, **kwargs):
         pass  # pragma: nocover
 
@@ -119,6 +125,93 @@ def test_get_params():
         pass  # pragma: nocover
 
 
-    assert get_params(inspect.signature(pow)) == ['/', 'x', 'y', 'z=None']
+    assert get_params(inspect.signature(positional_only)) == ['/', 'x', 'y', 'z=None']
     assert get_params(inspect.signature(generics)) == ['*args', '**kwargs']
     assert get_params(inspect.signature(keyword_only)) == ['*', 'foo', 'bar']
+
+
+def test_autodoc_dependencies():
+    md = Markdown(extensions=[AutoDocExtension()])
+    md.convert("::: import_examples.example_function\n")
+    assert len(md.autodoc_dependencies) == 1
+    assert md.autodoc_dependencies[0].endswith("example_module.py")
+
+    md.reset()
+    assert md.autodoc_dependencies == []
+
+
+def test_autodoc_cache(tmpdir, monkeypatch):
+    module_path = os.path.join(tmpdir, "cached_module.py")
+    cache_dir = os.path.join(tmpdir, "cache")
+    with open(module_path, "w") as module_file:
+        module_file.write('VALUE = 1\n\ndef function(a):\n    """Original."""\n')
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    calls = []
+    original_introspect = autodoc.introspect
+
+    def introspect(import_string):
+        calls.append(import_string)
+        return original_introspect(import_string)
+
+    monkeypatch.setattr(autodoc, "introspect", introspect)
+    monkeypatch.setattr(autodoc, "IMPORTED_SOURCES", {})
+
+    # Items are only inspected once, across documents and `Markdown` instances.
+    cache = AutoDocCache(cache_dir)
+    for _ in range(2):
+        md = Markdown(extensions=[AutoDocExtension(cache=cache)])
+        text = md.convert("::: cached_module.function\n    :docstring:\n")
+        assert "<p>Original.</p>" in text
+        assert md.autodoc_dependencies == [module_path]
+    assert calls == ["cached_module.function"]
+
+    # Later builds use the cache on disk, so the module isn't imported.
+    cache = AutoDocCache(cache_dir)
+    info = cache.get("cached_module.function")
+    assert info["params"] == ["a"]
+    assert calls == ["cached_module.function"]
+
+    # Changing the source file invalidates the cache. The module has already
+    # been imported, so it's inspected in a fresh process instead.
+    with open(module_path, "w") as module_file:
+        module_file.write('VALUE = 1\n\ndef function(a, b):\n    """Changed."""\n')
+    info = cache.get("cached_module.function")
+    assert info["params"] == ["a", "b"]
+    assert info["docstring"] == "Changed."
+    assert calls == ["cached_module.function"]
+
+    # Caches may be pickled, to send to parallel build workers.
+    cache = pickle.loads(pickle.dumps(cache))
+    assert cache.get("cached_module.function")["docstring"] == "Changed."
+    assert calls == ["cached_module.function"]
+
+
+def test_autodoc_cache_base_class(tmpdir, monkeypatch):
+    base_path = os.path.join(tmpdir, "base_module.py")
+    with open(base_path, "w") as module_file:
+        module_file.write('class Base:\n    def method(self):\n        """Original."""\n')
+    with open(os.path.join(tmpdir, "child_module.py"), "w") as module_file:
+        module_file.write('from base_module import Base\n\nclass Child(Base):\n    pass\n')
+    monkeypatch.syspath_prepend(str(tmpdir))
+    monkeypatch.setattr(autodoc, "IMPORTED_SOURCES", {})
+
+    cache = AutoDocCache()
+    info = cache.get("child_module.Child")
+    assert [member["docstring"] for member in info["members"]] == ["Original."]
+
+    # Changing a base class invalidates the subclass, even though the
+    # subclass's own module is unchanged, and still refers to the old base.
+    with open(base_path, "w") as module_file:
+        module_file.write('class Base:\n    def method(self, a):\n        """Changed."""\n')
+    info = cache.get("child_module.Child")
+    assert [member["docstring"] for member in info["members"]] == ["Changed."]
+    assert info["members"][0]["params"] == ["self", "a"]
+
+
+def test_autodoc_constant():
+    md = Markdown(extensions=[AutoDocExtension()])
+    text = md.convert("::: import_examples.example_module.EXAMPLE_CONSTANT\n")
+    assert text == """<div class="autodoc">
+<p class="autodoc-signature"><code class="autodoc-module">import_examples.example_module.</code><code class="autodoc-name">EXAMPLE_CONSTANT</code></p>
+</div>"""
@@ -0,0 +1,235 @@
+from markdown import Markdown
+from mkdocs2.markdown_extensions.autodoc import (
+    AutoDocCache,
+    AutoDocExtension,
+    introspect,
+)
+from mkdocs2.markdown_extensions.autodoc_static import StaticInspector
+import os
+import pytest
+
+BASE_PY = '''
+class Base:
+    """
+    Base *docstring*.
+    """
+
+    def __init__(self, size, *, name="base"):
+        pass
+
+    def inherited(self, x=(1, 2)):
+        """Inherited docstring."""
+'''
+
+IMPL_PY = '''
+"""
+The implementation.
+"""
+from static_package import base
+import static_package.base as base_alias
+import os
+import typing
+
+DEFAULT = object()
+BUFFER_SIZE = 64 * 1024
+count: int = 0
+
+
+class Widget(base.Base):
+    """
+    Widget docstring.
+    """
+
+    @property
+    def size(self):
+        """Size docstring."""
+
+    @size.setter
+    def size(self, value):
+        pass
+
+    @size.deleter
+    def size(self):
+        pass
+
+    @classmethod
+    def create(cls, a, /, b, *args, c=None, **kwargs):
+        """Create docstring."""
+
+    @staticmethod
+    def helper(value=-1.5):
+        pass
+
+    async def fetch(self):
+        pass
+
+    def _private(self):
+        pass
+
+
+class Other(base_alias.Base):
+    pass
+
+
+def uses_default(value=DEFAULT, other={"a": [1]}):
+    pass
+
+
+def uses_constants(size=BUFFER_SIZE, limit=2 * BUFFER_SIZE, flags=-(1 << 2), names=("a",) * 2):
+    pass
+
+
+class Settings(typing.Mapping[str, int]):
+    limit: int = 10
+    debug = False
+'''
+
+SUB_PY = """
+from ..base import Base
+"""
+
+# Never imported, since its defaults can't be evaluated.
+UNEVALUATED_PY = """
+from .base import Base
+
+limit: int
+
+
+def uses_names(kind=Base, size=limit, ratio=1 / 0, flags=len("ab")):
+    pass
+
+
+class Outer:
+    class Inner:
+        pass
+"""
+
+
+def write_file(path, text):
+    """
+    Helper function to write 'text' to the file at 'path'.
+    """
+    dirname = os.path.dirname(path)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(path, "w") as output:
+        output.write(text)
+
+
+@pytest.fixture
+def static_package(tmpdir, monkeypatch):
+    package_dir = os.path.join(tmpdir, "static_package")
+    write_file(os.path.join(package_dir, "__init__.py"), "from .impl import *\n")
+    write_file(os.path.join(package_dir, "base.py"), BASE_PY)
+    write_file(os.path.join(package_dir, "impl.py"), IMPL_PY)
+    write_file(os.path.join(package_dir, "sub", "__init__.py"), SUB_PY)
+    write_file(os.path.join(package_dir, "unevaluated.py"), UNEVALUATED_PY)
+    monkeypatch.syspath_prepend(str(tmpdir))
+    return package_dir
+
+
+def test_static_matches_import(static_package):
+    inspector = StaticInspector()
+    for import_string in [
+        "import_examples.example_function",
+        "import_examples.ExampleClass",
+        "static_package.impl.Widget",
+        "static_package.Widget",
+        "static_package.impl.Other",
+        "static_package.base.Base",
+        "static_package.sub.Base",
+        "static_package.impl.uses_constants",
+    ]:
+        expected = introspect(import_string)
+        info = inspector.introspect(import_string)
+        assert sorted(info.pop("sources")) == sorted(expected.pop("sources"))
+        assert info == expected
+
+    info = inspector.introspect("static_package.impl.Widget")
+    assert info["params"] == ["size", "*", "name='base'"]
+    assert [member["name"] for member in info["members"]] == [
+        "create",
+        "fetch",
+        "helper",
+        "inherited",
+        "size",
+    ]
+    size = info["members"][-1]
+    assert size["params"] is None
+    assert size["docstring"] == "Size docstring."
+
+    # Constant expressions are evaluated, as they are for imported functions.
+    info = inspector.introspect("static_package.impl.uses_constants")
+    assert info["params"] == [
+        "size=65536",
+        "limit=131072",
+        "flags=-4",
+        "names=('a', 'a')",
+    ]
+
+
+def test_static_differences(static_package):
+    inspector = StaticInspector()
+
+    # Defaults that aren't constant are shown as they are in the source.
+    info = inspector.introspect("static_package.impl.uses_default")
+    assert info["params"] == ["value=DEFAULT", "other={'a': [1]}"]
+    info = inspector.introspect("static_package.unevaluated.uses_names")
+    assert info["params"] == [
+        "kind=Base",
+        "size=limit",
+        "ratio=1 / 0",
+        'flags=len("ab")',
+    ]
+    info = inspector.introspect("static_package.unevaluated.Outer")
+    assert [member["name"] for member in info["members"]] == ["Inner"]
+
+    # Constants and class attributes are documented without a docstring.
+    info = inspector.introspect("static_package.impl.DEFAULT")
+    assert info["params"] is None
+    assert info["docstring"] == ""
+    info = inspector.introspect("static_package.impl.Settings")
+    assert info["params"] == []
+    members = [(member["name"], member["docstring"]) for member in info["members"]]
+    assert members == [("debug", ""), ("limit", "")]
+
+    # Modules, including submodules imported into a package.
+    info = inspector.introspect("static_package.impl")
+    assert info["docstring"] == "The implementation."
+    names = [member["name"] for member in info["members"]]
+    assert names == [
+        "BUFFER_SIZE",
+        "DEFAULT",
+        "Other",
+        "Settings",
+        "Widget",
+        "count",
+        "uses_constants",
+        "uses_default",
+    ]
+
+    with pytest.raises(ValueError):
+        inspector.introspect("missing_package.Widget")
+    with pytest.raises(ValueError):
+        inspector.introspect("static_package.impl.Missing")
+    with pytest.raises(ValueError):
+        inspector.introspect("static_package.missing")
+
+
+def test_static_parse_cache(static_package):
+    inspector = StaticInspector()
+    impl_path = os.path.join(static_package, "impl.py")
+    first = inspector.get_module("static_package.impl")
+    assert inspector.get_module("static_package.impl") is first
+
+    write_file(impl_path, '"""Changed."""\n')
+    second = inspector.get_module("static_package.impl")
+    assert second is not first
+    assert inspector.introspect("static_package.impl")["docstring"] == "Changed."
+
+
+def test_static_autodoc_html():
+    source = "::: import_examples.ExampleClass\n    :docstring:\n    :members:\n"
+    static = Markdown(extensions=[AutoDocExtension(AutoDocCache(backend="static"))])
+    imported = Markdown(extensions=[AutoDocExtension()])
+    assert static.convert(source) == imported.convert(source)
@@ -0,0 +1,71 @@
+from markdown import Markdown
+from markdown.extensions.codehilite import CodeHiliteExtension
+from markdown.extensions.fenced_code import FencedCodeExtension
+from mkdocs2.markdown_extensions import highlight
+from mkdocs2.markdown_extensions.highlight import Highlight, Highlighter
+import json
+import pickle
+
+
+DOCUMENT = """
+# Code
+
+```python
+def add(x, y):
+    return x + y
+```
+
+~~~{.js .example hl_lines="1"}
+var a = 1;
+~~~
+
+``` hl_lines="2"
+print("hello")
+x = 1
+```
+
+    #!python
+    import os
+
+    :::unknown-language
+    <b>plain text</b>
+"""
+
+
+def test_highlight():
+    expected = Markdown(extensions=[FencedCodeExtension(), CodeHiliteExtension()])
+    md = Markdown(extensions=[Highlight()])
+    assert md.convert(DOCUMENT) == expected.convert(DOCUMENT)
+
+    # Identical code is only highlighted once.
+    entries = dict(md.highlighter.entries)
+    md.convert(DOCUMENT)
+    assert md.highlighter.entries == entries
+
+
+def test_highlight_disk_cache(tmpdir, monkeypatch):
+    highlighter = Highlighter(cache_dir=str(tmpdir))
+    html = highlighter.highlight("x = 1", "python", True, {})
+    assert html.startswith('<div class="highlight">')
+
+    def fail(*args, **kwargs):
+        raise AssertionError()  # pragma: nocover
+
+    # Later builds load the highlighted code from disk.
+    monkeypatch.setattr(highlight.pygments, "highlight", fail)
+    highlighter = pickle.loads(pickle.dumps(Highlighter(cache_dir=str(tmpdir))))
+    assert highlighter.highlight("x = 1", "python", True, {}) == html
+
+
+def test_highlight_without_guessing(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError()  # pragma: nocover
+
+    monkeypatch.setattr(highlight, "guess_lexer", fail)
+    md = Markdown(extensions=[Highlight(guess_lang=False, default_lang="python")])
+    html = md.convert("```\nimport os\n```\n\n```unknown\nimport os\n```")
+    assert html.count('<span class="kn">import</span>') == 1
+
+    # Each lexer is only looked up once.
+    lexers = [json.loads(key)[0] for key in md.highlighter.lexers]
+    assert lexers == ["python", "unknown", "text"]
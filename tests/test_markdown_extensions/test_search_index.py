@@ -53,3 +53,17 @@ Aenean vel elit `scelerisque` mauris pellentesque pulvinar pellentesque habitant
             "text": "Viverra maecenas accumsan lacus vel facilisis volutpat est.\nAenean vel elit  scelerisque ",
         },
     ]
+
+
+def test_search_index_permalinks():
+    md = Markdown(extensions=[TocExtension(permalink=True), SearchIndex()])
+    md.convert(
+        """
+# The `build` command
+
+*Builds* the site.
+"""
+    )
+    assert md.search_index == [
+        {"ref": "the-build-command", "title": "The build command", "text": "Builds "}
+    ]
@@ -0,0 +1,35 @@
+from mkdocs2.search import (
+    build_inverted_index,
+    decode_postings,
+    encode_postings,
+    stem,
+    tokenize,
+)
+
+
+def test_stem():
+    assert stem("building") == "build"
+    assert stem("builds") == "build"
+    assert stem("is") == "is"
+    assert stem("things") == "thing"
+    assert tokenize("Building the Docs!") == ["build", "the", "doc"]
+
+
+def test_postings():
+    postings = [(0, 1), (5, 2), (300, 1000), (100000, 1)]
+    encoded = encode_postings(postings)
+    assert isinstance(encoded, str)
+    assert decode_postings(encoded) == postings
+    assert decode_postings(encode_postings([])) == []
+
+
+def test_build_inverted_index():
+    docs = [
+        {"title": "Install", "text": "Installing the package."},
+        {"title": "Usage", "text": "Using the package, or the package API."},
+    ]
+    index = build_inverted_index(docs)
+    terms = index["terms"]
+    assert decode_postings(terms["package"]) == [(0, 1), (1, 2)]
+    assert decode_postings(terms["install"]) == [(0, 2)]
+    assert list(terms) == sorted(terms)
@@ -0,0 +1,414 @@
+from mkdocs2.server import (
+    BuildVersion,
+    DocsServer,
+    LazySite,
+    RequestHandler,
+    Watcher,
+    inject_livereload_script,
+)
+import functools
+import gzip
+import http.client
+import os
+import threading
+
+
+def write_file(path, text):
+    """
+    Helper function to write 'text' to the file at 'path'.
+    """
+    dirname = os.path.dirname(path)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(path, "w") as output:
+        output.write(text)
+
+
+def test_watcher(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    config = os.path.join(tmpdir, "mkdocs.yml")
+    index_md = os.path.join(input_dir, "index.md")
+    a_md = os.path.join(input_dir, "topics", "a.md")
+    write_file(index_md, "# index")
+    write_file(config, "build: {}")
+
+    watcher = Watcher([config, input_dir, os.path.join(tmpdir, "missing")])
+    assert watcher.get_changes() == set()
+
+    write_file(index_md, "# index modified")
+    write_file(a_md, "# a")
+    assert watcher.get_changes() == {index_md, a_md}
+    assert watcher.get_changes() == set()
+
+    os.remove(a_md)
+    write_file(config, "build: {input_dir: input}")
+    assert watcher.get_changes() == {a_md, config}
+
+
+def test_build_version():
+    build_version = BuildVersion()
+    assert not build_version.wait_for_change(0, timeout=0.01)
+    build_version.increment()
+    assert build_version.wait_for_change(0, timeout=0.01)
+    assert build_version.value == 1
+
+
+def test_inject_livereload_script():
+    html = inject_livereload_script(b"<html><body>abc</body></html>", version=3)
+    assert html.startswith(b"<html><body>abc<script>")
+    assert b'new EventSource("/livereload?version=3")' in html
+    assert html.endswith(b"</script></body></html>")
+
+    html = inject_livereload_script(b"abc", version=3)
+    assert html.startswith(b"abc<script>")
+
+
+def test_request_handler(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "index.md"), "abc")
+    write_file(os.path.join(input_dir, "css", "base.css"), "body {}")
+    write_file(os.path.join(input_dir, "img", "image.png"), "xxx")
+    write_file(
+        os.path.join(template_dir, "base.html"),
+        "<html><body>{{ content }}</body></html>",
+    )
+    site = LazySite(
+        {
+            "build": {
+                "input_dir": input_dir,
+                "output_dir": os.path.join(tmpdir, "output"),
+                "template_dir": template_dir,
+            },
+            "convertors": [
+                "mkdocs2.convertors.MarkdownPages",
+                "mkdocs2.convertors.StaticFiles",
+            ],
+        }
+    )
+
+    build_version = BuildVersion()
+    handler = functools.partial(RequestHandler, site=site, build_version=build_version)
+    server = DocsServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        connection = http.client.HTTPConnection(host, port)
+
+        # HTML pages include the livereload script.
+        connection.request("GET", "/")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert b"EventSource" in response.read()
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+
+        # Conditional requests, made over the same keep-alive connection.
+        connection.request("GET", "/", headers={"If-None-Match": etag})
+        response = connection.getresponse()
+        assert response.status == 304
+        response.read()
+
+        connection.request("GET", "/", headers={"If-Modified-Since": last_modified})
+        response = connection.getresponse()
+        assert response.status == 304
+        response.read()
+
+        connection.request("GET", "/", headers={"If-Modified-Since": "invalid"})
+        response = connection.getresponse()
+        assert response.status == 200
+        response.read()
+
+        # Text responses may be compressed.
+        connection.request("GET", "/css/base.css", headers={"Accept-Encoding": "gzip"})
+        response = connection.getresponse()
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(response.read()) == b"body {}"
+
+        # Other files are served as they are.
+        connection.request("GET", "/img/image.png", headers={"Accept-Encoding": "gzip"})
+        response = connection.getresponse()
+        assert response.headers["Content-Encoding"] is None
+        assert response.read() == b"xxx"
+
+        connection.request("GET", "/missing.html")
+        response = connection.getresponse()
+        assert response.status == 404
+        response.read()
+
+        # The livereload endpoint responds once the version changes.
+        build_version.increment()
+        connection.request("GET", "/livereload?version=0")
+        response = connection.getresponse()
+        assert response.headers["Content-Type"] == "text/event-stream"
+        assert b"data: reload" in response.read()
+
+        # The build version is included in the ETag for HTML pages.
+        connection = http.client.HTTPConnection(host, port)
+        connection.request("GET", "/", headers={"If-None-Match": etag})
+        response = connection.getresponse()
+        assert response.status == 200
+        response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # Without a build version, pages are served as they are.
+    handler = functools.partial(RequestHandler, site=site)
+    server = DocsServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        connection = http.client.HTTPConnection(host, port)
+        connection.request("GET", "/")
+        response = connection.getresponse()
+        assert response.read().startswith(b"<html><body><p>abc</p>")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_request_rate():
+    server = DocsServer(("127.0.0.1", 0), RequestHandler)
+    try:
+        assert server.record_request() == 1.0
+        assert server.record_request() == 2.0
+        server.request_times[0] -= 2.0
+        assert server.record_request() == 2.0
+    finally:
+        server.server_close()
+
+
+def test_lazy_site(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "index.md"), "# index\n[a](topics/a.md)")
+    write_file(os.path.join(input_dir, "topics", "a.md"), "# a")
+    write_file(os.path.join(input_dir, "css", "base.css"), "body {}")
+    write_file(os.path.join(template_dir, "base.html"), "<body>{{ content }}</body>")
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": os.path.join(tmpdir, "output"),
+            "template_dir": template_dir,
+        },
+        "convertors": [
+            "mkdocs2.convertors.MarkdownPages",
+            "mkdocs2.convertors.StaticFiles",
+        ],
+    }
+
+    # Nothing is built until it is requested.
+    site = LazySite(config)
+    assert site.output.contents == {}
+
+    content, mtime, output_path = site.get("/topics/a/")
+    assert content.startswith(b'<body><h1 id="a">')
+    assert output_path == os.path.join("topics", "a", "index.html")
+    assert list(site.output.contents) == [output_path]
+
+    # Subsequent requests are served from memory.
+    assert site.get("/topics/a/index.html") == (content, mtime, output_path)
+    assert site.get("/css/base.css")[0] == b"body {}"
+    assert site.get("/missing/") is None
+
+    # Built files are cached until their inputs change.
+    index_content, index_mtime, _ = site.get("/")
+    assert site.get("/") == (index_content, index_mtime, "index.html")
+    a_md = os.path.join(input_dir, "topics", "a.md")
+    write_file(a_md, "# a modified")
+    content, mtime, output_path = site.get("/topics/a/")
+    assert b"a modified" in content
+    assert site.get("/") == (index_content, index_mtime, "index.html")
+
+    # Modifying existing inputs doesn't require reloading the site,
+    # but other changes do.
+    assert not site.requires_reload({a_md})
+    assert site.requires_reload({os.path.join(input_dir, "new.md")})
+    assert site.requires_reload({os.path.join(template_dir, "base.html")})
+    os.remove(a_md)
+    assert site.requires_reload({a_md})
+    write_file(a_md, "# a")
+
+    # Reloading discards anything that's been built.
+    site.load()
+    assert site.output.contents == {}
+
+    # Nothing is written to the output directory.
+    assert not os.path.exists(os.path.join(tmpdir, "output"))
+
+    handler = functools.partial(RequestHandler, site=site)
+    server = DocsServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        connection = http.client.HTTPConnection(host, port)
+
+        connection.request("GET", "/")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.headers["Content-Type"] == "text/html"
+        assert response.read().startswith(b'<body><h1 id="index">')
+
+        connection.request("GET", "/topics/a")
+        response = connection.getresponse()
+        assert response.status == 301
+        assert response.headers["Location"] == "/topics/a/"
+        response.read()
+
+        connection.request("GET", "/missing")
+        response = connection.getresponse()
+        assert response.status == 404
+        response.read()
+
+        # Errors building a file are reported in the response.
+        write_file(os.path.join(input_dir, "topics", "a.md"), "[b](b.md)")
+        connection.request("GET", "/topics/a/")
+        response = connection.getresponse()
+        assert response.status == 500
+        response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_lazy_site_search_shards(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "index.md"), "# Home\n\nWelcome home.")
+    write_file(os.path.join(template_dir, "base.html"), "{{ content }}")
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": os.path.join(tmpdir, "output"),
+            "template_dir": template_dir,
+        },
+        "convertors": [
+            "mkdocs2.convertors.MarkdownPages",
+            {"mkdocs2.convertors.Search": {"shards": 1}},
+        ],
+    }
+
+    # Shards are served once the manifest has been built.
+    site = LazySite(config)
+    assert site.get("/search_index/docs-0.json") is None
+    assert site.get("/search_index.json") is not None
+    content, _, output_path = site.get("/search_index/docs-0.json")
+    assert output_path == "search_index/docs-0.json"
+    assert b"Welcome home." in content
+
+
+def test_lazy_site_search_edits(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    template_dir = os.path.join(tmpdir, "templates")
+    index_md = os.path.join(input_dir, "index.md")
+    write_file(index_md, "# Home\n\nWelcome home.")
+    write_file(os.path.join(template_dir, "base.html"), "{{ content }}")
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": os.path.join(tmpdir, "output"),
+            "template_dir": template_dir,
+        },
+        "convertors": [
+            "mkdocs2.convertors.MarkdownPages",
+            "mkdocs2.convertors.Search",
+        ],
+    }
+
+    # Pages edited since they were built are parsed again for the index.
+    site = LazySite(config)
+    site.get("/")
+    write_file(index_md, "# Home\n\nWelcome back.")
+    content = site.get("/search_index.json")[0]
+    assert b"Welcome back." in content and b"Welcome home." not in content
+    site.get("/")
+    assert site.get("/search_index.json")[0] == content
+
+    write_file(index_md, "# Home\n\nWelcome home.")
+    assert b"Welcome home." in site.get("/search_index.json")[0]
+
+
+def test_lazy_site_fingerprinted_assets(tmpdir):
+    input_dir = os.path.join(tmpdir, "input")
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(os.path.join(input_dir, "index.md"), "# index")
+    write_file(os.path.join(input_dir, "css", "base.css"), "body {}")
+    write_file(os.path.join(template_dir, "base.html"), "{{ url('/css/base.css') }}")
+    config = {
+        "build": {
+            "input_dir": input_dir,
+            "output_dir": os.path.join(tmpdir, "output"),
+            "template_dir": template_dir,
+        },
+        "convertors": [
+            "mkdocs2.convertors.MarkdownPages",
+            "mkdocs2.convertors.Assets",
+        ],
+    }
+
+    site = LazySite(config)
+    css_url = "/" + site.get("/")[0].decode("utf-8")
+    assert css_url.startswith("/css/base.") and css_url != "/css/base.css"
+    assert site.is_fingerprinted(css_url)
+    assert not site.is_fingerprinted("/css/base.css")
+    assert not site.is_fingerprinted("/")
+    assert not site.is_fingerprinted("/missing/")
+
+    handler = functools.partial(RequestHandler, site=site)
+    server = DocsServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        connection = http.client.HTTPConnection(host, port)
+
+        # Fingerprinted URLs may be cached indefinitely.
+        connection.request("GET", css_url)
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.headers["Cache-Control"] == (
+            "public, max-age=31536000, immutable"
+        )
+        assert response.read() == b"body {}"
+
+        # The original URL is still served, but must be revalidated.
+        connection.request("GET", "/css/base.css")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.headers["Cache-Control"] == "no-cache"
+        assert response.read() == b"body {}"
+
+        # Editing the asset changes its fingerprint, so the site must be
+        # reloaded. Until then, the old URL is no longer cached indefinitely.
+        css_path = os.path.join(input_dir, "css", "base.css")
+        write_file(css_path, "body { color: red }")
+        assert not site.requires_reload({os.path.join(input_dir, "index.md")})
+        assert site.requires_reload({css_path})
+        connection.request("GET", css_url)
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.headers["Cache-Control"] == "no-cache"
+        assert response.read() == b"body { color: red }"
+
+        # Once reloaded, pages link to the new fingerprinted URL.
+        site.load()
+        new_css_url = "/" + site.get("/")[0].decode("utf-8")
+        assert new_css_url.startswith("/css/base.") and new_css_url != css_url
+        connection.request("GET", new_css_url)
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.headers["Cache-Control"] == (
+            "public, max-age=31536000, immutable"
+        )
+        assert response.read() == b"body { color: red }"
+        connection.request("GET", css_url)
+        response = connection.getresponse()
+        assert response.status == 404
+        response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
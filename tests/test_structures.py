@@ -1,7 +1,8 @@
 import functools
 import os
+import pytest
 from mkdocs2 import core, types
-from mkdocs2.convertors import MarkdownPages, StaticFiles
+from mkdocs2.convertors import CodeHighlight, MarkdownPages, StaticFiles
 
 
 def write_file(path, text):
@@ -60,6 +61,73 @@ def test_gather_files(tmpdir):
     )
 
 
+def test_gather_files_ignore(tmpdir):
+    """
+    Ignored files and directories should be skipped, and scanning with
+    multiple threads should gather files in the same order.
+    """
+    input_dir = os.path.join(tmpdir, "input")
+    output_dir = os.path.join(tmpdir, "output")
+    convertors = [MarkdownPages(), StaticFiles()]
+
+    for path in [
+        "index.md",
+        "a/a.md",
+        "a/b/c.md",
+        "a/b/image.png",
+        "a/z.md",
+        "b.md",
+        "notes.tmp",
+        "drafts/draft.md",
+        "a/drafts/keep.md",
+        ".git/HEAD",
+        "node_modules/package/index.js",
+    ]:
+        write_file(os.path.join(input_dir, path), "xxx")
+
+    expected = [
+        os.path.join("a", "a.md"),
+        os.path.join("a", "b", "c.md"),
+        os.path.join("a", "b", "image.png"),
+        os.path.join("a", "drafts", "keep.md"),
+        os.path.join("a", "z.md"),
+        "b.md",
+        "index.md",
+    ]
+    for threads in (1, 4):
+        files = core.gather_files(
+            input_dir=input_dir,
+            output_dir=output_dir,
+            convertors=convertors,
+            ignore=["*.tmp", "drafts/**"],
+            threads=threads,
+        )
+        assert [file.input_path for file in files] == expected
+
+
+def test_convertor_patterns():
+    """
+    Convertor patterns are matched together in a single pass, with any
+    custom `should_handle_file` methods called in their place in the list.
+    """
+
+    class TextFiles(StaticFiles):
+        def should_handle_file(self, input_path):
+            return input_path.endswith(".txt")
+
+    pages, text, static = MarkdownPages(), TextFiles(), StaticFiles()
+    get_convertor = core.compile_convertor_patterns([pages, text, static])
+    assert get_convertor("index.md") is pages
+    assert get_convertor(os.path.join("a", "b.md")) is pages
+    assert get_convertor("notes.txt") is text
+    assert get_convertor("image.png") is static
+    assert pages.should_handle_file("index.md")
+    assert not pages.should_handle_file("image.png")
+
+    get_convertor = core.compile_convertor_patterns([pages, CodeHighlight()])
+    assert get_convertor("image.png") is None
+
+
 def test_overwrite_files(tmpdir):
     """
     Adding `gather_files` together should allow overwriting, so that
@@ -99,6 +167,48 @@ def test_overwrite_files(tmpdir):
     )
 
 
+def test_files_collection():
+    """
+    Replacing or removing files should keep every lookup consistent.
+    """
+    pages, static = MarkdownPages(), StaticFiles()
+    a = types.File("a.md", "a/index.html", "docs", "site", pages)
+    b = types.File("b.md", "b/index.html", "docs", "site", pages)
+    img = types.File("img.png", "img.png", "docs", "site", static)
+    css = types.File("", "css/a.css", "", "site", static)
+    other_css = types.File("", "css/b.css", "", "site", static)
+    files = types.Files([a, b, img, css, other_css])
+
+    # Files without an input path are identified by their output path.
+    assert len(files) == 5
+    assert files[3] is css
+    assert files.get_by_output_path("css/b.css") is other_css
+    assert files.get_by_convertor(static) == [img, css, other_css]
+
+    # Replacing a file moves it to the end, and updates the lookups.
+    new_a = types.File("a.md", "new-a/index.html", "theme", "site", pages)
+    files.append(new_a)
+    assert list(files) == [b, img, css, other_css, new_a]
+    assert files[4] is new_a
+    assert a not in files and new_a in files
+    assert files.get_by_input_path("a.md") is new_a
+    assert files.get_by_url_path("/new-a/") is new_a
+    assert files.get_by_convertor(pages) == [b, new_a]
+    with pytest.raises(KeyError):
+        files.get_by_url_path("/a/")
+    with pytest.raises(KeyError):
+        files.get_by_output_path("a/index.html")
+
+    files.remove(b)
+    assert list(files) == [img, css, other_css, new_a]
+    assert files.get_by_convertor(pages) == [new_a]
+    with pytest.raises(KeyError):
+        files.get_by_input_path("b.md")
+    with pytest.raises(ValueError):
+        files.remove(b)
+    assert files.get_by_convertor(MarkdownPages()) == []
+
+
 def test_load_nav():
     input_dir = "input"
     output_dir = "output"
@@ -248,6 +358,10 @@ def test_urls_for_files():
     )
     assert file.url == "/page.html"
 
+    # The URL is updated if the output path changes.
+    file.output_path = os.path.join("page", "index.html")
+    assert file.url == "/page/"
+
 
 def test_url_function():
     input_dir = "input"
@@ -370,6 +484,46 @@ def test_url_function():
     assert url("/topics/a/#anchor") == "https://example.com/topics/a/#anchor"
 
 
+def test_url_cache():
+    input_dir = "input"
+    output_dir = "output"
+    convertor = MarkdownPages()
+    files = types.Files(
+        [
+            types.File("index.md", "index.html", input_dir, output_dir, convertor),
+            types.File(
+                "topics/a.md", "topics/a/index.html", input_dir, output_dir, convertor
+            ),
+            types.File(
+                "topics/b.md", "topics/b/index.html", input_dir, output_dir, convertor
+            ),
+        ]
+    )
+    env = types.Env(files=files, nav=types.Nav([]), template_dir="templates")
+
+    # Links are resolved once for each input directory.
+    assert env.get_url("a.md?page=2#anchor", from_file=files[1]) == "./?page=2#anchor"
+    assert (
+        env.get_url("a.md?page=2#anchor", from_file=files[2]) == "../a/?page=2#anchor"
+    )
+    assert env.url_cache == {
+        ("a.md?page=2#anchor", "topics"): (files[1], "?page=2#anchor")
+    }
+
+    # Unresolvable links aren't cached.
+    with pytest.raises(KeyError):
+        env.get_url("missing.md", from_file=files[1])
+    assert len(env.url_cache) == 1
+
+
+def test_get_relative_url():
+    assert types.get_relative_url("/", "/") == "./"
+    assert types.get_relative_url("/topics/b/", "/topics/a/") == "../b/"
+    assert types.get_relative_url("/topics/a/", "/") == "topics/a/"
+    assert types.get_relative_url("/css/base.css", "/topics/a/") == "../../css/base.css"
+    assert types.get_relative_url("/topics/", "/topics/a/") == "../"
+
+
 def test_nav_absolute_urls():
     input_dir = "input"
     output_dir = "output"
@@ -470,3 +624,180 @@ def test_nav_relative_urls():
     assert nav[1].children[0].url == "."
     assert nav[1].children[1].url == "../b/"
     nav.deactivate()
+
+    view = nav.view(files[2])
+    assert view[0].url == "../../"
+    assert view[1].children[0].url == "../a/"
+
+
+def test_nav_view():
+    files = types.Files(
+        [
+            types.File(
+                input_path="index.md",
+                output_path="index.html",
+                input_dir="docs",
+                output_dir="build",
+                convertor=MarkdownPages(),
+            ),
+            types.File(
+                input_path=os.path.join("topics", "a.md"),
+                output_path=os.path.join("topics", "a", "index.html"),
+                input_dir="docs",
+                output_dir="build",
+                convertor=MarkdownPages(),
+            ),
+            types.File(
+                input_path=os.path.join("topics", "b.md"),
+                output_path=os.path.join("topics", "b", "index.html"),
+                input_dir="docs",
+                output_dir="build",
+                convertor=MarkdownPages(),
+            ),
+        ]
+    )
+
+    nav = types.Nav(
+        [
+            types.NavPage(title="Home", file=files[0]),
+            types.NavGroup(
+                title="Topics",
+                children=[
+                    types.NavPage(title="Topic A", file=files[1]),
+                    types.NavPage(title="Topic B", file=files[2]),
+                ],
+            ),
+        ]
+    )
+
+    view = nav.view(files[1])
+    assert view
+    assert len(view) == 2
+    assert len(list(view)) == 2
+    assert not view[0].is_active
+    assert view[1].is_active
+    assert view[1].children[0].is_active
+    assert not view[1].children[1].is_active
+    assert view[0].url == "../../"
+    assert view[1].children[0].url == "."
+    assert view[1].children[1].url == "../b/"
+
+    current_page = view.lookup_page(files[1])
+    assert current_page.title == "Topic A"
+    assert current_page.parent.title == "Topics"
+    assert current_page.parent.parent is None
+    assert current_page.previous.url == "../../"
+    assert current_page.previous.previous is None
+    assert current_page.next.url == "../b/"
+    assert current_page.next.next is None
+    assert view[0].parent is None
+    assert view.lookup_page(types.File("", "other.html", "", "build", None)) is None
+
+    # Views don't modify the shared navigation state.
+    assert nav.active_page is None
+    assert not nav[1].is_active
+    assert nav[0].url == "/"
+
+
+def test_nav_view_nested_groups():
+    file = types.File(
+        input_path=os.path.join("topics", "advanced", "a.md"),
+        output_path=os.path.join("topics", "advanced", "a", "index.html"),
+        input_dir="docs",
+        output_dir="build",
+        convertor=MarkdownPages(),
+    )
+    nav = types.Nav(
+        [
+            types.NavGroup(
+                title="Topics",
+                children=[
+                    types.NavGroup(
+                        title="Advanced",
+                        children=[types.NavPage(title="Topic A", file=file)],
+                    )
+                ],
+            )
+        ]
+    )
+
+    view = nav.view(file)
+    advanced = view.lookup_page(file).parent
+    assert advanced.title == "Advanced"
+    assert advanced.is_active
+    assert advanced.parent.title == "Topics"
+    assert advanced.parent.is_active
+    assert advanced.parent.parent is None
+
+
+def test_outputs(tmpdir):
+    input_path = os.path.join(tmpdir, "input.txt")
+    write_file(input_path, "xxx")
+
+    output = types.DiskOutput(os.path.join(tmpdir, "output"))
+    output.write_text(os.path.join("a", "index.html"), "aaa")
+    output.copy_file(input_path, os.path.join("b", "input.txt"))
+    assert output.exists(os.path.join("a", "index.html"))
+    assert output.exists(os.path.join("b", "input.txt"))
+    output.remove(os.path.join("a", "index.html"))
+    output.remove(os.path.join("a", "index.html"))
+    assert not output.exists(os.path.join("a", "index.html"))
+
+    # Outputs that are written incrementally are only moved into place once
+    # complete.
+    with output.open_text("c.txt") as output_file:
+        output_file.write("ccc")
+        assert not output.exists("c.txt")
+    assert output.exists("c.txt")
+    with pytest.raises(ValueError):
+        with output.open_text("d.txt") as output_file:
+            raise ValueError()
+    assert sorted(os.listdir(os.path.join(tmpdir, "output"))) == ["a", "b", "c.txt"]
+
+    # Outputs have the same mode as any other file created with the umask,
+    # rather than that of a temporary file.
+    umask = os.umask(0o022)
+    try:
+        output = types.DiskOutput(os.path.join(tmpdir, "output"))
+    finally:
+        os.umask(umask)
+    with output.open_text("e.txt") as output_file:
+        output_file.write("eee")
+    e_path = os.path.join(tmpdir, "output", "e.txt")
+    assert os.stat(e_path).st_mode & 0o777 == 0o644
+
+    output = types.MemoryOutput()
+    output.write_text("index.html", "aaa")
+    output.copy_file(input_path, "input.txt")
+    assert output.read_bytes("index.html")[0] == b"aaa"
+    assert output.read_bytes("input.txt")[0] == b"xxx"
+    output.remove("index.html")
+    assert not output.exists("index.html")
+    assert output.exists("input.txt")
+    assert not os.path.exists(os.path.join(tmpdir, "index.html"))
+
+
+def test_stream_template(tmpdir):
+    template_dir = os.path.join(tmpdir, "templates")
+    write_file(
+        os.path.join(template_dir, "base.html"),
+        "{% for item in items %}<p>{{ item }}</p>{% endfor %}",
+    )
+    env = types.Env(files=types.Files(), nav=types.Nav([]), template_dir=template_dir)
+    context = {"items": ["a" * 10, "b" * 10, "c"]}
+
+    class OutputFile:
+        def __init__(self):
+            self.writes = []
+
+        def write(self, text):
+            self.writes.append(text)
+
+    output_file = OutputFile()
+    env.stream_template("base.html", context, output_file, buffer_size=16)
+    assert "".join(output_file.writes) == env.render_template("base.html", context)
+    assert output_file.writes == [
+        "<p>aaaaaaaaaa</p>",
+        "<p>bbbbbbbbbb</p>",
+        "<p>c</p>",
+    ]